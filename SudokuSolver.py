@@ -1,419 +1,810 @@
+from array import array
+from board_model import InvalidBoard, digit_mask, mask_positions
+from itertools import count
+from random import Random
+from time import perf_counter
+
+from search import SolveCancelled, count_solutions, luby, search
+from step_trace import ELIMINATION, PLACEMENT
+
+SEARCH_BUDGET = 128  # guesses of a run of the search, multiplied at restarts by the terms of the Luby sequence
+
+
+class TechniqueStats:
+    """Statistics of a single solving technique, accumulated over a Solver's run."""
+
+    def __init__(self):
+        self.invocations = 0
+        self.seconds = 0.0
+        self.placements = 0  # digits placed
+        self.eliminations = 0  # possible values removed
+
+    def as_dict(self):
+        return {'invocations': self.invocations, 'seconds': self.seconds,
+                'placements': self.placements, 'eliminations': self.eliminations}
+
+
+class SolveStats:
+    """Statistics of a Solver's run, collected for every technique by its name."""
+
+    def __init__(self):
+        self.techniques = {}
+
+    def record(self, technique, seconds, placements, eliminations):
+        """Add a single invocation of a technique."""
+        stats = self.techniques.get(technique)
+        if stats is None:
+            stats = self.techniques[technique] = TechniqueStats()
+        stats.invocations += 1
+        stats.seconds += seconds
+        stats.placements += placements
+        stats.eliminations += eliminations
+
+    def merge(self, other):
+        """Add statistics of another run, e.g. to total them over many puzzles."""
+        for technique, other_stats in other.techniques.items():
+            stats = self.techniques.get(technique)
+            if stats is None:
+                stats = self.techniques[technique] = TechniqueStats()
+            stats.invocations += other_stats.invocations
+            stats.seconds += other_stats.seconds
+            stats.placements += other_stats.placements
+            stats.eliminations += other_stats.eliminations
+
+    @property
+    def seconds(self):
+        return sum(stats.seconds for stats in self.techniques.values())
+
+    def as_dict(self):
+        return {technique: stats.as_dict() for technique, stats in self.techniques.items()}
+
+
+def find_subsets(items, subset_size, start=0, ids=0, union=0):
+    """
+    Find combinations of subset_size items whose masks together have exactly subset_size bits set,
+    e.g. cells of a unit whose possible values are limited to the same subset_size digits.
+    Combinations are extended item by item, and dropped as soon as their union has more bits than subset_size.
+
+    :param items: list of (item id, mask) tuples.
+    :param subset_size: number of items to combine.
+    :return: generator of (mask of item ids, union of masks) tuples.
+    """
+    if ids.bit_count() == subset_size:
+        if union.bit_count() == subset_size:
+            yield ids, union
+        return
+    for index in range(start, len(items) - subset_size + ids.bit_count() + 1):
+        item_id, mask = items[index]
+        items_union = union | mask
+        if items_union.bit_count() <= subset_size:
+            yield from find_subsets(items, subset_size, index + 1, ids | 1 << item_id, items_union)
+
+
 class SudokuSolver:
     """Class holding all methods for solving a Sudoku."""
 
-    def __init__(self, rows, columns, squares):
+    def __init__(self, board, on_place=None, hooks=(), trace=None):
         """
-        Check board validity and prepare it for solving.
-        Create a list of differently segregated cells clusters.
-
-        :param rows: board cells segregated by rows.
-        :param columns: board cells segregated by columns.
-        :param squares: board cells segregated by 3x3 squares.
+        Prepare the board for solving. Clusters of cells are taken from the lookup tables of the board's Layout,
+        so boards of any supported size (4x4, 9x9, 16x16, 25x25) are solved the same way.
+        Raise InvalidBoard if the board has a contradiction, which is also checked at every following update.
+
+        :param board: SudokuBoard instance, which is solved in place.
+        :param on_place: optional callable(index, digit, technique) called every time the Solver
+        fills a cell. Used by the GUI to display solved digits.
+        :param hooks: callables(technique, seconds, placements, eliminations) called after every invocation
+        of a technique, e.g. to attach profilers or counters.
+        :param trace: optional StepTrace instance which records every placement and elimination.
         """
-        self.cluster_types = [rows, columns, squares]
-        self.check_board_validity()
+        self.board = board
+        self.layout = board.layout
+        self.size = board.layout.size  # Number of digits, and of cells in a unit
+        self.values = board.values
+        self.candidates = board.candidates
+        self.on_place = on_place
+        self.hooks = list(hooks)
+        self.stats = SolveStats()
+        self.placements = 0  # Part of updates_done that comes from placed digits
+        self.trace = trace
+        if trace is not None:
+            trace.layout = self.layout  # Cells are named by the board's size
+        self.technique = 'initial_analysis'  # Name of the currently running technique, used in the trace
+        self.cancelled = False
+        # Solving techniques ordered from the cheapest to the most expensive:
+        self.techniques = [self.check_singles, self.check_hidden_singles, self.check_naked_pairs,
+                           self.check_pointing, self.check_claiming, self.check_hidden_pairs, self.check_naked_triples,
+                           self.check_hidden_triples, self.check_x_wing, self.check_y_wing, self.check_naked_quads,
+                           self.check_hidden_quads, self.check_swordfish, self.check_jellyfish]
+        # Techniques run after every guess of the search, cheap enough to pay off on large boards:
+        self.search_techniques = [self.check_singles, self.check_hidden_singles]
+        self.search_random = None  # Random instance of the current run of the search
+        self.search_budget = 0  # guesses left in the current run of the search
+
         self.updates_done = 0  # Used to determine whether the solving algorithms are advancing
+        self.positions = None  # positions[unit][digit - 1]: mask of cells within a unit where a digit can be placed
+        self.unit_values = None  # unit_values[unit]: mask of digits placed in a unit
+        self.bivalue_cells = None  # bivalue_cells[mask]: empty cells with exactly those two possible values
+        # Units and digits changed by placements and eliminations, not yet passed on to worklists:
+        self.changed_units = 0
+        self.changed_digits = 0
+        self.worklists = {}  # worklists[key]: [mask of units, mask of digits] changed since the last take_worklist
+        self.journal = None  # packed (cell, previous possible values) of every change since mark() was first called
+        self.index_positions()
         self.initial_analysis()
 
     def check_board_validity(self):
-        """Raise 'Invalid Board' exception if a cell without value has no possible values
-        or there are two cells with same values within the same cluster."""
-        for clusters_type in self.cluster_types:
-            for cluster in clusters_type:
-                values = []
-                for cell in cluster:
-                    if cell.value:
-                        if cell.value in values:
-                            print(f'cell: {cell.list_coord} with value: {cell.value}')
-                            raise Exception('Board is invalid!')
-                        else:
-                            values.append(cell.value)
-                    else:
-                        if len(cell.possible_values) == 0:
-                            print(f'cell: {cell.list_coord} with possible values: {cell.possible_values}')
-                            raise Exception('Board is invalid!')
+        """
+        Check the whole board: raise InvalidBoard if a cell without value has no possible values
+        or there are two cells with same values within the same cluster. Contradictions are detected
+        incrementally while solving, so this full scan is only needed for boards changed outside the Solver.
+        """
+        for unit, cluster in enumerate(self.layout.units):
+            values = 0
+            for cell in cluster:
+                value = self.values[cell]
+                if value:
+                    if values & digit_mask(value):
+                        raise InvalidBoard('Digit placed twice', cell, unit, value, self.layout)
+                    values |= digit_mask(value)
+                elif not self.candidates[cell]:
+                    raise InvalidBoard('No possible values left', cell, layout=self.layout)
+
+    def index_positions(self):
+        """
+        Build the index of positions, within every unit, where each digit can still be placed,
+        and the masks of digits placed in every unit, as well as the index of bivalue cells.
+        Raise InvalidBoard for any contradiction.
+        Bit i of a position mask stands for the i-th cell of the unit. The index is kept up to date by
+        place_digit and update_cells, so techniques never have to scan cells to count positions.
+        """
+        self.check_board_validity()
+        layout = self.layout
+        self.positions = [[0] * self.size for _ in layout.units]
+        self.unit_values = [0] * len(layout.units)
+        self.bivalue_cells = {}
+        self.worklists = {}  # Every unit has to be examined again
+        for cell in range(layout.cells):
+            value = self.values[cell]
+            if value:
+                for unit in layout.cell_units[cell]:
+                    self.unit_values[unit] |= digit_mask(value)
+            else:
+                digits = mask_positions(self.candidates[cell])
+                for unit, position in zip(layout.cell_units[cell], layout.cell_unit_positions[cell]):
+                    unit_positions = self.positions[unit]
+                    for digit_id in digits:
+                        unit_positions[digit_id] |= 1 << position
+                if len(digits) == 2:
+                    self.bivalue_cells.setdefault(self.candidates[cell], set()).add(cell)
+
+        for unit in range(len(layout.units)):
+            for digit_id in range(self.size):
+                if not self.positions[unit][digit_id] and not self.unit_values[unit] & (1 << digit_id):
+                    raise InvalidBoard('No place left for a digit', unit=unit, digit=digit_id + 1, layout=layout)
 
     def initial_analysis(self):
         """Subtract initial Sudoku digits from influenced cells' possible values"""
-        for row in self.cluster_types[0]:
-            for cell in row:
-                if cell.value:
-                    self.update_cells(cell)
+        for cell in range(self.layout.cells):
+            if self.values[cell]:
+                self.update_cells(cell)
 
     def check_if_solved(self):
         """Check whether a Sudoku has already all cells filled."""
-        for row in self.cluster_types[0]:
-            for cell in row:
-                if not cell.value:
-                    return False
-        return True
+        return 0 not in self.values
 
-    def solve(self):
+    def solve(self, fallback=True):
         """
         A method that calls all solving functions until a Sudoku is solved, starting from the most basic.
-        If no updates are done moves on to more advanced methods.
-        With every loop of solving algorithms check board validity.
+        If no updates are done moves on to more advanced methods. After any update, start again
+        from the most basic one. Stop when the board is solved or no technique makes any progress.
+        Contradictions raise InvalidBoard as soon as they occur. If the board is still not solved, fill remaining
+        cells with a search over the possible values left by the techniques.
+
+        :param fallback: whether to use the search when the techniques stall.
+        :return: True if all cells are filled.
+        """
+        self.apply_techniques(self.techniques)
+        if fallback and not self.check_if_solved():
+            self.run_technique(self.search_remaining_cells)
+        return self.check_if_solved()
+
+    def apply_techniques(self, techniques):
+        """
+        Call solving techniques, from the first one, until the board is solved or none of them makes progress.
+        After any update, start again from the first one.
+
+        :param techniques: list of solving methods of the Solver, ordered from the cheapest.
+        """
+        level = 0
+        while level < len(techniques) and not self.check_if_solved():
+            if self.cancelled:
+                raise SolveCancelled()
+            if self.run_technique(techniques[level]):
+                level = 0
+            else:
+                level += 1
+
+    def run_technique(self, technique):
+        """
+        Call a solving technique, record its statistics and pass them to hooks.
+
+        :param technique: solving method of the Solver, recorded by its name.
+        :return: number of updates done by the technique.
         """
-        # !!! if a cell is solved, it has to have only 1 value in cell.possible_values !!!
-        # while not self.check_if_solved():
         self.updates_done = 0
+        placements = self.placements
+        self.technique = technique.__name__
+        start = perf_counter()
+        technique()
+        seconds = perf_counter() - start
+
+        placements = self.placements - placements
+        eliminations = self.updates_done - placements
+        self.stats.record(technique.__name__, seconds, placements, eliminations)
+        for hook in self.hooks:
+            hook(technique.__name__, seconds, placements, eliminations)
+        return self.updates_done
+
+    def count_solutions(self, limit=2):
+        """
+        Count solutions of the board, stopping as soon as `limit` of them are found.
+        Logical techniques are run first, so the search only explores the possible values they leave.
+        The board is restored afterwards. The techniques are called directly, so the trial steps are not recorded
+        in statistics, and neither hooks, the on_place callback nor the trace see them.
 
-        self.check_singles()
-        self.check_hidden_singles()
-        self.check_pairs()
-        self.check_triples()
-        self.check_pointing_pairs()
-        self.check_hidden_pairs()
-        self.check_x_wing()
-        # self.check_y_wing()
+        :param limit: maximum number of solutions to look for.
+        :return: number of solutions, at most limit. 0 if the board is invalid.
+        """
+        snapshot = self.snapshot()
+        on_place, trace = self.on_place, self.trace
+        updates_done, placements = self.updates_done, self.placements
+        self.on_place = self.trace = None
+        try:
+            self.propagate(self.techniques)
+            if self.check_if_solved():
+                return 1
+            return count_solutions(self.board, limit)
+        except InvalidBoard:
+            return 0
+        finally:
+            self.on_place, self.trace = on_place, trace
+            self.updates_done, self.placements = updates_done, placements
+            self.restore(snapshot)
+
+    def is_unique(self):
+        """Check whether the board has exactly one solution."""
+        return self.count_solutions(2) == 1
+
+    def cancel(self):
+        """Make solve() raise SolveCancelled as soon as possible. Can be called from another thread."""
+        self.cancelled = True
+
+    def search_remaining_cells(self):
+        """
+        Fill all empty cells with the solution found by search. Raise InvalidBoard if there is none.
+        Boards up to 9x9 use the copy-based search of search.py, which is fastest there. On 16x16 and 25x25 boards
+        the search branches on a cell with the fewest possible values and runs the cheapest logical techniques after
+        every guess, undoing wrong guesses with rollback(). Both searches randomize their choices and restart
+        whenever a budget of guesses runs out, with budgets following the Luby sequence, so that an early wrong
+        guess cannot leave a huge subtree to explore. Restarts are seeded, so solving is reproducible.
+        The on_place callback and the trace only see the final digits.
+        """
+        if self.size <= 9:
+            solution = search(self.board, is_cancelled=lambda: self.cancelled)
+        else:
+            solution = self.search_with_restarts()
+        if solution is None:
+            raise InvalidBoard('No solution found by search')
+        for cell in range(self.layout.cells):
+            if not self.values[cell]:
+                self.place_digit(cell, solution[cell], 'search')
+
+    def search_with_restarts(self):
+        """
+        Run search_branches() with restarts (see search_remaining_cells), leaving the board as it was found.
 
-        self.check_board_validity()
+        :return: list of values of a solution (by rows), or None if there is none.
+        """
+        journal, on_place, trace = self.journal, self.on_place, self.trace
+        updates_done, placements = self.updates_done, self.placements
+        self.on_place = self.trace = None
+        mark = self.mark()
+        solution = None
+        try:
+            for restart in count():
+                self.search_random = Random(restart)
+                self.search_budget = SEARCH_BUDGET * luby(restart + 1)
+                solution = self.search_branches()
+                self.rollback(mark)
+                if solution is not None or self.search_budget >= 0:  # found, or the whole tree was searched
+                    break
+        finally:
+            self.rollback(mark)
+            if journal is None:
+                self.journal = None
+            self.on_place, self.trace = on_place, trace
+            self.updates_done, self.placements = updates_done, placements  # guesses are not counted as steps
+        return solution
+
+    def propagate(self, techniques):
+        """
+        Run techniques until they make no progress, like apply_techniques(), but call them directly, without
+        statistics or hooks. Used for trial steps which are undone afterwards, e.g. after a guess of the search.
 
-    def update_cells(self, cell=None, influenced_cells=None, values=None):
+        :param techniques: list of solving methods of the Solver, ordered from the cheapest.
+        """
+        level = 0
+        while level < len(techniques) and not self.check_if_solved():
+            updates_done = self.updates_done
+            techniques[level]()
+            level = 0 if self.updates_done != updates_done else level + 1
+
+    def search_choices(self):
+        """
+        Pick a cell to guess: one with two possible values if there is any, otherwise one with the fewest of them.
+        Ties are broken at random, so that every restart of the search explores a different tree.
+
+        :return: list of (cell, digit) guesses in random order.
+        """
+        cells = sorted(cell for cells in self.bivalue_cells.values() for cell in cells)
+        if not cells:
+            counts = {cell: self.candidates[cell].bit_count() for cell in range(self.layout.cells)
+                      if not self.values[cell]}
+            fewest = min(counts.values())
+            cells = [cell for cell, cell_count in counts.items() if cell_count == fewest]
+        cell = self.search_random.choice(cells)
+        guesses = [(cell, position + 1) for position in mask_positions(self.candidates[cell])]
+        self.search_random.shuffle(guesses)
+        return guesses
+
+    def search_branches(self):
+        """
+        Depth-first search over the possible values of a cell picked by search_choices(),
+        until search_budget guesses are spent.
+
+        :return: list of values of a solution (by rows), or None if there is none or the budget ran out
+        (search_budget is negative then). The board is left as found in the last branch.
+        """
+        if self.cancelled:
+            raise SolveCancelled()
+        if self.check_if_solved():
+            return self.values.copy()
+        for cell, digit in self.search_choices():
+            self.search_budget -= 1
+            if self.search_budget < 0:
+                return None
+            mark = self.mark()
+            try:
+                self.place_digit(cell, digit, 'search')
+                self.update_cells(cell)
+                self.propagate(self.search_techniques)
+                solution = self.search_branches()
+            except InvalidBoard:
+                solution = None
+            if solution is not None or self.search_budget < 0:
+                return solution
+            self.rollback(mark)
+        return None
+
+    def place_digit(self, cell, digit, technique):
+        """
+        Fill a cell with a digit found by a solving technique and report it to the on_place callback.
+        The cell is no longer a possible position of any digit within its units.
+        Raise InvalidBoard if the digit is not possible there, or another digit is left without a place.
+
+        :param cell: index of the cell.
+        :param digit: digit to be placed.
+        :param technique: name of the technique that found the digit.
+        """
+        layout = self.layout
+        value = digit_mask(digit)
+        mask = self.candidates[cell]
+        if not mask & value:
+            raise InvalidBoard('Digit is not possible in the cell', cell, digit=digit, layout=layout)
+        for unit in layout.cell_units[cell]:
+            if self.unit_values[unit] & value:
+                raise InvalidBoard('Digit placed twice', cell, unit, digit, layout)
+
+        if self.journal is not None:
+            self.journal.append(cell << 32 | mask)
+        for unit in layout.cell_units[cell]:
+            self.unit_values[unit] |= value
+        if mask.bit_count() == 2:
+            self.bivalue_cells[mask].discard(cell)
+        self.changed_units |= layout.cell_unit_masks[cell]
+        self.changed_digits |= mask
+        self.board.place(cell, digit)
+
+        digits = mask_positions(mask)
+        for unit, position in zip(layout.cell_units[cell], layout.cell_unit_positions[cell]):
+            unit_positions = self.positions[unit]
+            for digit_id in digits:
+                unit_positions[digit_id] &= ~(1 << position)
+                if not unit_positions[digit_id] and not self.unit_values[unit] & (1 << digit_id):
+                    raise InvalidBoard('No place left for a digit', cell, unit, digit_id + 1, layout)
+
+        self.updates_done += 1
+        self.placements += 1
+        if self.trace is not None:
+            self.trace.record(self.technique, PLACEMENT, cell, value)
+        if self.on_place:
+            self.on_place(cell, digit, technique)
+
+    def update_cells(self, cell=None, influenced_cells=None, values=0):
         """
         A dynamic method used for every solving algorithm.
-        Collects information about influenced cells and values and updates cells' attributes accordingly.
-
-        :param cell: a cell with value which has to be removed from possible values of every cell
-        that is within influence clusters.
-        :param influenced_cells: used if cell=None, list of cells that require updating.
-        :param values: used if cell=None, list of values to be subtracted from possible values of influenced_cells.
-        """
-        if cell:
-            value = cell.value
-            row = self.cluster_types[0][cell.list_coord[0]]
-            column = self.cluster_types[1][cell.list_coord[1]]
-            square = self.cluster_types[2][cell.square_id]
-            influence_clusters = [row, column, square]
-            for cluster in influence_clusters:
-                for cell in cluster:
-                    if not cell.value:
-                        if value in cell.possible_values:
-                            cell.possible_values.remove(value)
-                            self.updates_done += 1
+        Collects information about influenced cells and values and updates cells' attributes
+        and the position and bivalue indexes accordingly. Units and values changed are recorded for worklists,
+        and every change is recorded in the journal, if there is one.
+        Raise InvalidBoard as soon as a cell has no possible values left or a digit has no place left in a unit.
+
+        :param cell: index of a cell with value which has to be removed from possible values of every
+        one of its peers.
+        :param influenced_cells: used if cell=None, iterable of cell indexes that require updating.
+        :param values: used if cell=None, mask of values to be subtracted from possible values of influenced_cells.
+        """
+        layout = self.layout
+        cell_units = layout.cell_units
+        cell_unit_positions = layout.cell_unit_positions
+        cell_unit_masks = layout.cell_unit_masks
+        changed_units = 0
+        cell_values = self.values
+        candidates = self.candidates
+        positions = self.positions
+        unit_values = self.unit_values
+        bivalue_cells = self.bivalue_cells
+        journal = self.journal
+        trace = self.trace
+        if cell is not None:
+            digit_id = cell_values[cell] - 1
+            value = 1 << digit_id
+            changed_digits = value
+            for influence_cell in layout.peers[cell]:
+                if not cell_values[influence_cell]:
+                    mask = candidates[influence_cell]
+                    if mask & value:
+                        if journal is not None:
+                            journal.append(influence_cell << 32 | mask)
+                        if mask.bit_count() == 2:
+                            bivalue_cells[mask].discard(influence_cell)
+                        mask ^= value
+                        candidates[influence_cell] = mask
+                        if mask.bit_count() == 2:
+                            bivalue_cells.setdefault(mask, set()).add(influence_cell)
+                        changed_units |= cell_unit_masks[influence_cell]
+                        self.updates_done += 1
+                        if trace is not None:
+                            trace.record(self.technique, ELIMINATION, influence_cell, value)
+                        if not candidates[influence_cell]:
+                            raise InvalidBoard('No possible values left', influence_cell, layout=layout)
+                        for unit, position in zip(cell_units[influence_cell], cell_unit_positions[influence_cell]):
+                            unit_positions = positions[unit]
+                            unit_positions[digit_id] &= ~(1 << position)
+                            if not unit_positions[digit_id] and not unit_values[unit] & value:
+                                raise InvalidBoard('No place left for a digit', influence_cell, unit, digit_id + 1,
+                                                   layout)
         else:
-            for value in values:
-                for influence_cell in influenced_cells:
-                    if not influence_cell.value:
-                        if value in influence_cell.possible_values:
-                            influence_cell.possible_values.remove(value)
-                            self.updates_done += 1
+            changed_digits = 0
+            for influence_cell in influenced_cells:
+                if not cell_values[influence_cell]:
+                    mask = candidates[influence_cell]
+                    removed = mask & values
+                    if removed:
+                        if journal is not None:
+                            journal.append(influence_cell << 32 | mask)
+                        if mask.bit_count() == 2:
+                            bivalue_cells[mask].discard(influence_cell)
+                        mask ^= removed
+                        candidates[influence_cell] = mask
+                        if mask.bit_count() == 2:
+                            bivalue_cells.setdefault(mask, set()).add(influence_cell)
+                        changed_units |= cell_unit_masks[influence_cell]
+                        changed_digits |= removed
+                        self.updates_done += removed.bit_count()
+                        if trace is not None:
+                            trace.record(self.technique, ELIMINATION, influence_cell, removed)
+                        if not candidates[influence_cell]:
+                            raise InvalidBoard('No possible values left', influence_cell, layout=layout)
+                        digits = mask_positions(removed)
+                        for unit, position in zip(cell_units[influence_cell], cell_unit_positions[influence_cell]):
+                            unit_positions = positions[unit]
+                            for digit_id in digits:
+                                unit_positions[digit_id] &= ~(1 << position)
+                                if not unit_positions[digit_id] and not unit_values[unit] & (1 << digit_id):
+                                    raise InvalidBoard('No place left for a digit', influence_cell, unit,
+                                                       digit_id + 1, layout)
+        if changed_units:
+            self.changed_units |= changed_units
+            self.changed_digits |= changed_digits
+
+    def snapshot(self):
+        """Return a copy of the solver's state, the board's values and possible values, in a flat buffer."""
+        return self.board.snapshot()
+
+    def restore(self, snapshot):
+        """
+        Bring back the state saved by snapshot(), rebuilding the indexes from it. Marks of the journal are discarded.
+
+        :param snapshot: buffer returned by snapshot().
+        """
+        self.board.restore(snapshot)
+        if self.journal is not None:
+            self.journal = array('Q')
+        self.index_positions()
+
+    def mark(self):
+        """
+        Return a mark of the current state, to which rollback() can return. Placements and eliminations are
+        recorded in the journal from the first call on, so a mark costs nothing and a rollback only undoes changes.
+        """
+        if self.journal is None:
+            self.journal = array('Q')
+        return len(self.journal)
+
+    def rollback(self, mark):
+        """
+        Undo placements and eliminations done since a mark, newest first, together with their updates
+        of the indexes.
+
+        :param mark: value returned by mark().
+        """
+        layout = self.layout
+        journal = self.journal
+        positions = self.positions
+        bivalue_cells = self.bivalue_cells
+        while len(journal) > mark:
+            entry = journal.pop()
+            cell = entry >> 32
+            previous = entry & 0xffffffff
+            mask = self.candidates[cell]
+            if mask.bit_count() == 2:
+                bivalue_cells[mask].discard(cell)
+            if self.values[cell]:  # Undo a placement
+                self.values[cell] = 0
+                for unit in layout.cell_units[cell]:
+                    self.unit_values[unit] &= ~mask
+                restored = previous
+            else:
+                restored = previous & ~mask
+            self.candidates[cell] = previous
+            if previous.bit_count() == 2:
+                bivalue_cells.setdefault(previous, set()).add(cell)
+
+            digits = mask_positions(restored)
+            for unit, position in zip(layout.cell_units[cell], layout.cell_unit_positions[cell]):
+                unit_positions = positions[unit]
+                for digit_id in digits:
+                    unit_positions[digit_id] |= 1 << position
+            self.changed_units |= layout.cell_unit_masks[cell]
+            self.changed_digits |= previous
+
+    def take_worklist(self, key):
+        """
+        Return masks of units and of values changed since the last call with the same key, e.g. a technique's name,
+        so that techniques only examine what may give new results. The first call returns all units and values.
+
+        :param key: identifier of the technique asking, each key keeps its own worklist.
+        :return: tuple of a mask of unit ids and a mask of values.
+        """
+        if self.changed_units:
+            for worklist in self.worklists.values():
+                worklist[0] |= self.changed_units
+                worklist[1] |= self.changed_digits
+            self.changed_units = 0
+            self.changed_digits = 0
+        worklist = self.worklists.get(key)
+        self.worklists[key] = [0, 0]
+        if worklist is None:
+            return self.layout.all_units, self.layout.all_candidates
+        return worklist[0], worklist[1]
 
     def check_singles(self):
         """
-        Check all cells by all clusters. If a cell can only have 1 value, update it.
+        Check all cells of rows changed since the last call. If a cell can only have 1 value, update it.
         Update all cells that are influenced by newly added digit.
         """
-        for clusters_type in self.cluster_types:
-            for cluster in clusters_type:
-                for cell in cluster:
-                    if not cell.value:
-                        if len(cell.possible_values) == 1:
-                            digit = cell.possible_values[0]
-                            cell.show_digit(digit, 'slate grey')
-                            self.update_cells(cell)
-
-    def check_pairs(self):
-        """
-        Check if two cells within a cluster has the same two possible values and only two.
-        If that is the case, update remaining cells within the cluster.
-        """
-        for clusters_type in self.cluster_types:
-            for cluster in clusters_type:
-                for cell in cluster:
-                    values = cell.possible_values
-                    if len(values) == 2:
-                        other_cells = cluster.copy()
-                        other_cells.remove(cell)
-                        for other_cell in other_cells:
-                            if values == other_cell.possible_values:
-                                other_cells.remove(other_cell)
-                                self.update_cells(influenced_cells=other_cells, values=values)
-                                break
-
-    def check_triples(self):
-        """
-        Check if 3 cells within a cluster has a triple. That is, 3 pairs of 3 different values e.g.
-        (1, 2), (2, 3) and (3, 1). If that is the case, remove those values from possible values of
-        other cells within the cluster.
-        """
-        for clusters_type in self.cluster_types:
-            for cluster in clusters_type:
-                for cell in cluster:
-
-                    # Get a cell with only two possible values:
-                    if len(cell.possible_values) == 2:
-                        other_cells = cluster.copy()
-                        other_cells.remove(cell)
-
-                        # Find another cell with only 2 possible values, within a cluster:
-                        for second_cell in other_cells:
-                            set_1 = set(cell.possible_values)
-                            set_2 = set(second_cell.possible_values)
-                            set_3 = None
-
-                            # Check if at least one value is alike within both cells:
-                            if len(set_2) == 2 and set_1 & set_2:
-                                other_cells.remove(second_cell)
-
-                                # Find 3rd cell with 2 possible values
-                                for third_cell in other_cells:
-                                    set_3 = set(third_cell.possible_values)
-                                    values = list(set_1 | set_2 | set_3)
-
-                                    # Check if 3rd cell has a paired value with 1st and 2nd cell:
-                                    if len(set_3) == 2 and set_1 & set_3 and set_2 & set_3 and len(values) == 3:
-                                        other_cells.remove(third_cell)
-                                        self.update_cells(influenced_cells=other_cells, values=values)
-                                        break
-                            if set_3:
-                                break
+        units, _ = self.take_worklist('check_singles')
+        for row in mask_positions(units & (1 << self.size) - 1):
+            for cell in self.layout.rows[row]:
+                if not self.values[cell]:
+                    mask = self.candidates[cell]
+                    if mask and not mask & (mask - 1):
+                        self.place_digit(cell, mask.bit_length(), 'singles')
+                        self.update_cells(cell)
+
+    def check_naked_pairs(self):
+        """Find two cells within a cluster which can only have the same two values."""
+        self.check_naked_subsets(2)
+
+    def check_naked_triples(self):
+        """
+        Find three cells within a cluster which can only have values among the same three,
+        e.g. (1, 2), (2, 3) and (1, 2, 3).
+        """
+        self.check_naked_subsets(3)
+
+    def check_naked_quads(self):
+        """Find four cells within a cluster which can only have values among the same four."""
+        self.check_naked_subsets(4)
+
+    def check_naked_subsets(self, subset_size):
+        """
+        Find subset_size cells within a cluster whose possible values, together, are only subset_size values.
+        Those values have to be in those cells, so they are removed from possible values of other cells
+        within the cluster.
+
+        :param subset_size: number of cells (and values) in a subset.
+        """
+        units, _ = self.take_worklist(('check_naked_subsets', subset_size))
+        for unit in mask_positions(units):
+            cluster = self.layout.units[unit]
+            cells = []
+            for position, cell in enumerate(cluster):
+                if not self.values[cell] and 2 <= self.candidates[cell].bit_count() <= subset_size:
+                    cells.append((position, self.candidates[cell]))
+
+            for subset_positions, values in find_subsets(cells, subset_size):
+                other_cells = [cell for position, cell in enumerate(cluster) if not subset_positions >> position & 1]
+                self.update_cells(influenced_cells=other_cells, values=values)
 
     def check_hidden_singles(self):
         """
-        Find a cell within a cluster that has a unique value in possible values, that cannot occur
-        in other cells within the same cluster. If so, change that cell's possible values to a list
-        of that single value, and update all influenced cells.
-        """
-        for clusters_type in self.cluster_types:
-            for cluster in clusters_type:
-                # Find all cells in a cluster that are still to be solved:
-                empty_cluster_cells = cluster.copy()
-                for cell in cluster:
-                    if cell.value:
-                        empty_cluster_cells.remove(cell)
-
-                # Get empty cells excluding the one that is currently analysed:
-                for cell in empty_cluster_cells:
-                    other_cells = empty_cluster_cells.copy()
-                    other_cells.remove(cell)
-
-                    # Check if any digit in the cell, is single in the cluster:
-                    for value in cell.possible_values:
-                        is_single = True
-                        for other_cell in other_cells:
-                            if value in other_cell.possible_values:
-                                is_single = False
-                                break
-                        if is_single:
-                            cell.possible_values = [value]
-                            cell.show_digit(value, 'green')
-                            self.update_cells(cell)
+        Find a digit which can only be placed in a single cell within a cluster, according to the position index.
+        If so, fill that cell with the digit, and update all influenced cells. Only changed clusters are checked.
+        """
+        units, _ = self.take_worklist('check_hidden_singles')
+        for unit in mask_positions(units):
+            cluster = self.layout.units[unit]
+            unit_positions = self.positions[unit]
+            for digit_id in range(self.size):
+                positions = unit_positions[digit_id]
+                if positions and not positions & (positions - 1):
+                    cell = cluster[positions.bit_length() - 1]
+                    self.place_digit(cell, digit_id + 1, 'hidden_singles')
+                    self.update_cells(cell)
 
     def check_hidden_pairs(self):
-        """
-        Find a pair of cells in a cluster, that can have a unique pair of values which cannot occur
-        in other cells within the same cluster. If so,
-        """
-        for clusters_type in self.cluster_types:
-            for cluster in clusters_type:
-
-                # Get empty cells and missing values in a cluster:
-                empty_cells = cluster.copy()
-                possible_values = list(range(1, 10))
-                for cell in cluster:
-                    if cell.value:
-                        empty_cells.remove(cell)
-                        possible_values.remove(cell.value)
-
-                # Get a value that can only be in two cells within a cluster:
-                for possible_value in possible_values:
-                    decisive_cells = []
-                    for empty_cell in empty_cells:
-                        if len(decisive_cells) > 2:
-                            break
-                        if possible_value in empty_cell.possible_values:
-                            decisive_cells.append(empty_cell)
-
-                    # Get remaining empty cells (excluding decisive cells) and remaining possible values:
-                    if len(decisive_cells) == 2:
-                        possible_values.remove(possible_value)
-                        other_possible_values = list(
-                            set(decisive_cells[0].possible_values) & set(decisive_cells[1].possible_values))
-                        other_possible_values.remove(possible_value)
-                        other_empty_cells = empty_cells.copy()
-                        for decisive_cell in decisive_cells:
-                            other_empty_cells.remove(decisive_cell)
-
-                        # Check if there is another unique value for decisive cells:
-                        for other_possible_value in other_possible_values:
-                            is_unique = True
-                            for other_empty_cell in other_empty_cells:
-                                if other_possible_value in other_empty_cell.possible_values:
-                                    is_unique = False
-                                    break
-                            if is_unique:
-                                possible_values.remove(other_possible_value)
-                                # for decisive_cell in decisive_cells:
-                                #     decisive_cell.possible_values = possible_values
-                                self.update_cells(influenced_cells=decisive_cells, values=possible_values)
+        """Find two values which can only be placed in the same two cells within a cluster."""
+        self.check_hidden_subsets(2)
 
     def check_hidden_triples(self):
-        pass
-
-    def check_pointing_pairs(self):
-        squares = self.cluster_types[2]
-        for square in squares:
-
-            # Get remaining empty cells and values in a square:
-            empty_square_cells = square.copy()
-            possible_values = list(range(1, 10))
-            for cell in square:
-                if cell.value:
-                    possible_values.remove(cell.value)
-                    empty_square_cells.remove(cell)
-
-            # Check if any value can only be in two cells within a square:
-            for possible_value in possible_values:
-                decisive_cells = []
-                for empty_cell in empty_square_cells:
-                    if len(decisive_cells) > 2:
-                        break
-                    elif possible_value in empty_cell.possible_values:
-                        decisive_cells.append(empty_cell)
-
-                # Check if the values are in the same row or column:
-                if len(decisive_cells) == 2:
-                    # Rows:
-                    if decisive_cells[0].list_coord[0] == decisive_cells[1].list_coord[0]:
-                        row_id = decisive_cells[0].list_coord[0]
-                        other_row_cells = self.cluster_types[0][row_id].copy()
-                        for decisive_cell in decisive_cells:
-                            other_row_cells.remove(decisive_cell)
-                        self.update_cells(influenced_cells=other_row_cells, values=[possible_value])
-                    # Columns:
-                    elif decisive_cells[0].list_coord[1] == decisive_cells[1].list_coord[1]:
-                        column_id = decisive_cells[0].list_coord[1]
-                        other_column_cells = self.cluster_types[1][column_id].copy()
-                        for decisive_cell in decisive_cells:
-                            other_column_cells.remove(decisive_cell)
-                        self.update_cells(influenced_cells=other_column_cells, values=[possible_value])
-
-    def check_pointing_triples(self):
-        pass
+        """Find three values which can only be placed among the same three cells within a cluster."""
+        self.check_hidden_subsets(3)
+
+    def check_hidden_quads(self):
+        """Find four values which can only be placed among the same four cells within a cluster."""
+        self.check_hidden_subsets(4)
+
+    def check_hidden_subsets(self, subset_size):
+        """
+        Find subset_size values which, according to the position index, can only be placed among the same
+        subset_size cells within a cluster. Those cells have to hold those values, so all other values
+        are removed from their possible values.
+
+        :param subset_size: number of values (and cells) in a subset.
+        """
+        all_candidates = self.layout.all_candidates
+        units, _ = self.take_worklist(('check_hidden_subsets', subset_size))
+        for unit in mask_positions(units):
+            cluster = self.layout.units[unit]
+            unit_positions = self.positions[unit]
+            digits = [(digit_id, positions) for digit_id, positions in enumerate(unit_positions)
+                      if 2 <= positions.bit_count() <= subset_size]
+
+            for subset_values, positions in find_subsets(digits, subset_size):
+                decisive_cells = [cluster[position] for position in mask_positions(positions)]
+                self.update_cells(influenced_cells=decisive_cells, values=all_candidates & ~subset_values)
+
+    def check_pointing(self):
+        """
+        Find a value which, within a square, can only be in cells shared with a row or a column.
+        If so, remove it from other cells of that row or column.
+        """
+        self.check_intersections(pointing=True)
+
+    def check_claiming(self):
+        """
+        Find a value which, within a row or a column, can only be in cells shared with a square.
+        If so, remove it from other cells of that square.
+        """
+        self.check_intersections(pointing=False)
+
+    def check_intersections(self, pointing):
+        """
+        Box-line reduction over the precomputed intersections of squares with rows and columns.
+        A value confined to an intersection within one of the two units is removed from the rest of the other one.
+        Any number of aligned cells is found with a single AND of the value's position mask.
+
+        :param pointing: whether to look for values confined within squares (pointing) or within lines (claiming).
+        """
+        size = self.size
+        layout = self.layout
+        positions = self.positions
+        units, _ = self.take_worklist(('check_intersections', pointing))
+        for square, line, square_mask, line_mask in layout.intersections:
+            if not (units >> square | units >> line) & 1:
+                continue
+            if pointing:
+                source, target, source_mask, target_mask = square, line, square_mask, line_mask
+            else:
+                source, target, source_mask, target_mask = line, square, line_mask, square_mask
+            source_positions = positions[source]
+            target_positions = positions[target]
+            for digit_id in range(size):
+                confined = source_positions[digit_id]
+                if confined and not confined & ~source_mask:
+                    outside = target_positions[digit_id] & ~target_mask
+                    if outside:
+                        cluster = layout.units[target]
+                        self.update_cells(influenced_cells=[cluster[position] for position in mask_positions(outside)],
+                                          values=1 << digit_id)
 
     def check_x_wing(self):
-        for cluster_type in self.cluster_types[0:2]:
-            remaining_clusters = cluster_type.copy()
-            for cluster in cluster_type:
-                # Remove current cluster from the list:
-                temp_remaining_clusters = remaining_clusters.copy()
-                temp_remaining_clusters.remove(cluster)
-
-                # Find empty cells and missing values in a cluster:
-                empty_cells = cluster.copy()
-                possible_values = list(range(1, 10))
-                for cell in cluster:
-                    if cell.value:
-                        empty_cells.remove(cell)
-                        possible_values.remove(cell.value)
-
-                # Find a value that can only be in two cells in a cluster:
-                for possible_value in possible_values:
-                    counter = 0
-                    pair_1 = []
-                    for empty_cell in empty_cells:
-                        if possible_value in empty_cell.possible_values and counter < 3:
-                            counter += 1
-                            pair_1.append(empty_cell)
-
-                    if counter == 2:
-                        # Check for another cluster of the same type, in which the same number can only be in 2 cells:
-                        for remaining_cluster in temp_remaining_clusters:
-                            rc_counter = 0
-                            pair_2 = []
-                            for rc_cell in remaining_cluster:
-                                if (len(rc_cell.possible_values) > 1) and (
-                                        possible_value in rc_cell.possible_values) and (rc_counter < 3):
-                                    rc_counter += 1
-                                    pair_2.append(rc_cell)
-
-                            if rc_counter == 2:
-                                # Check whether the found pairs of cells have corresponding coordinates:
-                                pair_1_cell_1 = pair_1[0].list_coord
-                                pair_1_cell_2 = pair_1[1].list_coord
-                                pair_2_cell_1 = pair_2[0].list_coord
-                                pair_2_cell_2 = pair_2[1].list_coord
-                                influence_clusters = None
-
-                                # Horizontal x-wings:
-                                if pair_1_cell_1[1] == pair_2_cell_1[1] and pair_1_cell_2[1] == pair_2_cell_2[1]:
-                                    influence_col_1 = self.cluster_types[1][pair_1_cell_1[1]]
-                                    influence_col_2 = self.cluster_types[1][pair_1_cell_2[1]]
-                                    influence_clusters = (influence_col_1, influence_col_2)
-
-                                # Vertical x-wing:
-                                elif pair_1_cell_1[0] == pair_2_cell_1[0] and pair_1_cell_2[0] == pair_2_cell_2[0]:
-                                    influence_row_1 = self.cluster_types[0][pair_1_cell_1[0]]
-                                    influence_row_2 = self.cluster_types[0][pair_1_cell_2[0]]
-                                    influence_clusters = (influence_row_1, influence_row_2)
-
-                                if influence_clusters:
-                                    influence_cells = []
-                                    for influence_cluster in influence_clusters:
-                                        temp_cell_list = []
-                                        for ic_cell in influence_cluster:
-                                            if not ic_cell.value and possible_value in ic_cell.possible_values:
-                                                temp_cell_list.append(ic_cell)
-                                        influence_cells.extend(temp_cell_list)
-
-                                    if len(influence_cells) > 4:
-                                        pair_1.extend(pair_2)
-                                        for x_wing_cell in pair_1:
-                                            influence_cells.remove(x_wing_cell)
-                                        self.update_cells(influenced_cells=influence_cells, values=[possible_value])
-
-                remaining_clusters.remove(cluster)
+        """
+        Find a value which can only be in the same two positions within two rows. If so, remove it from
+        other cells of the two columns crossing those positions. The same is done for columns and rows.
+        """
+        self.check_fish(2)
 
     def check_y_wing(self):
-        # Get all cells with only 2 possible values:
-        potential_pivots = []
-        for row in self.cluster_types[0]:
-            for cell in row:
-                if len(cell.possible_values) == 2:
-                    potential_pivots.append(cell)
-
-        # Find a pivot and pincers:
-        y_wing_cells = []  # First cell in the list is the pivot
-        for potential_pivot in potential_pivots:
-            possible_values = potential_pivot.possible_values
-            potential_pincers = potential_pivots.copy()
-            potential_pincers.remove(potential_pivot)
-            test_1_pincers = []
-            for potential_pincer in potential_pincers:
-                # (test_1) Check if cells have one digit in common and if they influence each other:
-                same_square = potential_pincer.square_id == potential_pivot.square_id
-                if len(set(possible_values) | set(potential_pincer.possible_values)) == 3:
-                    cluster_id = None
-                    # Check if a cell has the same row or column as a potential pivot:
-                    if potential_pincer.list_coord[0] == potential_pivot.list_coord[0]:
-                        cluster_id = 0
-                    elif potential_pincer.list_coord[1] == potential_pivot.list_coord[1]:
-                        cluster_id = 1
-                    if same_square and not cluster_id:
-                        cluster_id = 2
-                    if cluster_id is not None:
-                        test_1_pincers.append((potential_pincer, cluster_id))
-
-            if len(test_1_pincers) >= 2:
-                # (test_2) Find actual pincers among potential ones:
-                for pincer_tuple in test_1_pincers:
-                    test_1_copy = test_1_pincers.copy()
-                    test_1_copy.remove(pincer_tuple)
-                    for pincer_tuple_2 in test_1_copy:
-                        if pincer_tuple[1] != pincer_tuple_2[1]:
-                            set_1 = set(potential_pivot.possible_values)
-                            set_2 = set(pincer_tuple[0].possible_values)
-                            set_3 = set(pincer_tuple_2[0].possible_values)
-                            y_wing_value_1 = set_1 & set_2
-                            y_wing_value_2 = set_1 & set_3
-                            if y_wing_value_1 != y_wing_value_2:
-                                y_wing_value_3 = set_2 & set_3
-                                print(y_wing_value_1)
-                                print(y_wing_value_2)
-                                print(y_wing_value_3)
-                                print(pincer_tuple[0].list_coord)
-                                print(pincer_tuple_2[0].list_coord)
+        """
+        Find an XY-Wing: a pivot cell with two possible values x and y, which sees two pincer cells with
+        possible values x, z and y, z. Whichever value the pivot takes, one of the pincers has to be z,
+        so z is removed from cells seeing both pincers. Pivots and pincers are taken from the bivalue index.
+        """
+        units, _ = self.take_worklist('check_y_wing')
+        if not units:
+            return
+        layout = self.layout
+        all_candidates = layout.all_candidates
+        for pivot_values, pivots in list(self.bivalue_cells.items()):
+            value_x = pivot_values & -pivot_values
+            value_y = pivot_values ^ value_x
+            for pivot in list(pivots):
+                pivot_peers = layout.peer_sets[pivot]
+                other_values = all_candidates & ~pivot_values
+                while other_values:
+                    value_z = other_values & -other_values
+                    other_values ^= value_z
+                    pincers_x = self.bivalue_cells.get(value_x | value_z)
+                    pincers_y = self.bivalue_cells.get(value_y | value_z)
+                    if not pincers_x or not pincers_y:
+                        continue
+                    for pincer_x in pivot_peers.intersection(pincers_x):
+                        for pincer_y in pivot_peers.intersection(pincers_y):
+                            self.update_cells(influenced_cells=layout.common_peers(pincer_x, pincer_y),
+                                              values=value_z)
 
     def check_swordfish(self):
-        pass
+        """Find a fish of three rows (columns), whose value can only be in the same three columns (rows)."""
+        self.check_fish(3)
+
+    def check_jellyfish(self):
+        """Find a fish of four rows (columns), whose value can only be in the same four columns (rows)."""
+        self.check_fish(4)
+
+    def check_fish(self, fish_size):
+        """
+        Find fish_size base rows in which a value can only be in the same fish_size columns, according to
+        the position index. The value then has to be in those columns within the base rows, so it is removed
+        from other cells of the columns. The same is done for base columns and crossing rows.
+        X-Wing, Swordfish and Jellyfish are fish of size 2, 3 and 4.
+
+        :param fish_size: number of base rows (columns).
+        """
+        size = self.size
+        _, digits = self.take_worklist(('check_fish', fish_size))
+        for first_unit, crossing_clusters in ((0, self.layout.columns), (size, self.layout.rows)):
+            for digit_id in mask_positions(digits):
+                # Base candidates: lines in which the value has from 2 to fish_size positions:
+                lines = []
+                for line_id in range(size):
+                    positions = self.positions[first_unit + line_id][digit_id]
+                    if 2 <= positions.bit_count() <= fish_size:
+                        lines.append((line_id, positions))
+
+                for base_lines, cover_lines in find_subsets(lines, fish_size):
+                    influence_cells = [cell for position in mask_positions(cover_lines)
+                                       for cell_id, cell in enumerate(crossing_clusters[position])
+                                       if not base_lines >> cell_id & 1]
+                    self.update_cells(influenced_cells=influence_cells, values=1 << digit_id)
@@ -0,0 +1,78 @@
+from multiprocessing import Pool
+
+from board_model import InvalidBoard, SudokuBoard
+from corpus import Corpus
+from SudokuSolver import SudokuSolver
+
+
+def read_puzzles(path):
+    """
+    Read puzzles from a text file with one puzzle per line, e.g. of 81 characters.
+    Empty lines and lines starting with '#' are skipped.
+
+    :param path: path of the puzzle file.
+    :return: generator of puzzle strings.
+    """
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+
+def solve_puzzle(puzzle):
+    """
+    Solve a single puzzle given as a string, e.g. of 81 characters for a 9x9 board (see SudokuBoard.from_string).
+
+    :return: tuple of the puzzle and its solution string, or None as the solution if the board is invalid.
+    """
+    try:
+        board = SudokuBoard.from_string(puzzle)
+        SudokuSolver(board).solve()
+    except (ValueError, InvalidBoard):
+        return puzzle, None
+    return puzzle, board.to_string()
+
+
+def solve_puzzles(puzzles, processes=None, chunksize=256, ordered=True):
+    """
+    Solve puzzles across a pool of worker processes and stream the results back.
+    Puzzles are sent to workers in chunks, so that small puzzles are not dominated by inter-process communication.
+
+    :param puzzles: iterable of 81-character puzzle strings, e.g. read_puzzles(path).
+    :param processes: number of worker processes, all cores by default.
+    :param chunksize: number of puzzles sent to a worker at once.
+    :param ordered: if True, yield results in the order of puzzles, otherwise as soon as they are solved.
+    :return: generator of (puzzle, solution) tuples, see solve_puzzle.
+    """
+    with Pool(processes) as pool:
+        solve_chunks = pool.imap if ordered else pool.imap_unordered
+        yield from solve_chunks(solve_puzzle, puzzles, chunksize)
+
+
+_worker_corpus = None  # Corpus opened once by every worker of solve_corpus
+
+
+def _open_corpus(path):
+    global _worker_corpus
+    _worker_corpus = Corpus(path)
+
+
+def _solve_corpus_puzzle(index):
+    return solve_puzzle(_worker_corpus[index])
+
+
+def solve_corpus(path, processes=None, chunksize=256, ordered=True):
+    """
+    Solve puzzles of a binary corpus file (see corpus.py) across a pool of worker processes.
+    Workers map the file themselves and only receive puzzle numbers, so they share its page cache
+    and no puzzle is sent between processes.
+
+    :param path: path of the corpus file.
+    :return: generator of (puzzle, solution) tuples, see solve_puzzle.
+    """
+    with Corpus(path) as corpus:
+        count = len(corpus)
+    with Pool(processes, _open_corpus, (path,)) as pool:
+        solve_chunks = pool.imap if ordered else pool.imap_unordered
+        yield from solve_chunks(_solve_corpus_puzzle, range(count), chunksize)
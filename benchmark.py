@@ -0,0 +1,150 @@
+"""
+Benchmark of SudokuSolver, run without the GUI. For example:
+
+    python benchmark.py --count 200 --output before.json
+    python benchmark.py --count 200 --output after.json --compare before.json
+    python benchmark.py --count 10000 --corpus puzzles.sdc
+"""
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from collections import defaultdict
+
+from board_model import SudokuBoard
+from corpus import Corpus
+from generator import SEARCH, SEEDS_PER_PUZZLE, generate_puzzles
+from SudokuSolver import SudokuSolver
+
+# Grades of generator.py grouped by difficulty, from the easiest:
+DIFFICULTIES = {
+    'easy': ('singles', 'hidden_singles'),
+    'medium': ('naked_pairs', 'pointing', 'claiming', 'hidden_pairs', 'naked_triples', 'hidden_triples'),
+    'hard': ('x_wing', 'y_wing', 'naked_quads', 'hidden_quads', 'swordfish', 'jellyfish'),
+    'search': (SEARCH,),
+}
+
+
+def build_corpus(count, seed=0, processes=None, max_seeds=None):
+    """
+    Build a reproducible corpus grouped by difficulty from generated puzzles, each put in the group of its grade.
+    Puzzles are generated from consecutive seeds until every group is full. Hard puzzles are rare, so at most
+    max_seeds seeds are tried, and groups may have fewer than count puzzles if they run out.
+
+    :param count: number of puzzles per difficulty.
+    :param seed: first seed of the generator.
+    :param processes: number of worker processes generating puzzles, all cores by default.
+    :param max_seeds: maximum number of seeds to try, count * SEEDS_PER_PUZZLE by default.
+    :return: dictionary of difficulty: list of puzzles, each a list of 81 values.
+    """
+    corpus = {difficulty: [] for difficulty in DIFFICULTIES}
+    groups = {grade: corpus[difficulty] for difficulty, grades in DIFFICULTIES.items() for grade in grades}
+    if max_seeds is None:
+        max_seeds = count * SEEDS_PER_PUZZLE
+    puzzles = generate_puzzles(max_seeds, processes=processes, seed=seed, max_seeds=max_seeds)
+    for puzzle, puzzle_grade in puzzles:
+        group = groups[puzzle_grade]
+        if len(group) < count:
+            group.append(SudokuBoard.from_string(puzzle).values)
+            if all(len(group) == count for group in corpus.values()):
+                break
+    puzzles.close()  # stops the worker processes
+    return corpus
+
+
+def solve_timed(values, technique_stats):
+    """
+    Solve a single puzzle, adding the Solver's statistics of every technique to technique_stats.
+    Return the solving time in seconds.
+    """
+    start = time.perf_counter()
+    solver = SudokuSolver(SudokuBoard(values))
+    solver.solve()
+    seconds = time.perf_counter() - start
+    for technique, stats in solver.stats.as_dict().items():
+        for key, value in stats.items():
+            technique_stats[technique][key] += value
+    return seconds
+
+
+def percentile(sorted_values, fraction):
+    """Return the nearest-rank percentile of a sorted list."""
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run_benchmark(corpus):
+    """
+    Solve every puzzle of a corpus and collect statistics for each difficulty:
+    puzzles per second, p50/p99 latency, memory peak, and time, invocations, placements and eliminations
+    of every technique.
+    """
+    results = {}
+    for difficulty, puzzles in corpus.items():
+        technique_stats = defaultdict(lambda: defaultdict(float))
+        latencies = sorted(solve_timed(puzzle, technique_stats) for puzzle in puzzles)
+
+        # Memory is measured in a separate pass, since tracing allocations slows solving down:
+        tracemalloc.start()
+        for puzzle in puzzles:
+            SudokuSolver(SudokuBoard(puzzle)).solve()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results[difficulty] = {
+            'puzzles': len(puzzles),
+            'puzzles_per_second': len(puzzles) / sum(latencies),
+            'p50_ms': percentile(latencies, 0.5) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'peak_memory_kb': peak_memory / 1024,
+            'techniques': {technique: dict(stats) for technique, stats in
+                           sorted(technique_stats.items(), key=lambda item: -item[1]['seconds'])},
+        }
+    return results
+
+
+def print_results(results, previous=None):
+    """Print benchmark results, with the change against previous results if given."""
+    for difficulty, stats in results.items():
+        line = (f"{difficulty:>10}: {stats['puzzles']} puzzles, {stats['puzzles_per_second']:.1f} puzzles/s, "
+                f"p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms, peak {stats['peak_memory_kb']:.0f} KiB")
+        if previous and difficulty in previous:
+            ratio = stats['puzzles_per_second'] / previous[difficulty]['puzzles_per_second']
+            line += f' ({ratio:.2f}x throughput)'
+        print(line)
+        for technique, technique_stats in stats['techniques'].items():
+            print(f"{technique:>32}: {technique_stats['seconds'] * 1000:.1f} ms, "
+                  f"{technique_stats['invocations']:.0f} calls, {technique_stats['placements']:.0f} placements, "
+                  f"{technique_stats['eliminations']:.0f} eliminations")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SudokuSolver over a corpus graded by difficulty.')
+    parser.add_argument('--count', type=int, default=100, help='number of puzzles per difficulty')
+    parser.add_argument('--seed', type=int, default=0, help='first seed used to generate the corpus')
+    parser.add_argument('--processes', type=int, help='number of processes generating the corpus, all cores by default')
+    parser.add_argument('--output', help='save results to a JSON file')
+    parser.add_argument('--compare', help='JSON file with results of a previous run')
+    parser.add_argument('--corpus', help='binary corpus file (see corpus.py) to benchmark, up to --count puzzles')
+    args = parser.parse_args()
+
+    if args.corpus:
+        with Corpus(args.corpus) as corpus:
+            puzzles = {'corpus': [corpus.values(index) for index in range(min(args.count, len(corpus)))]}
+    else:
+        puzzles = build_corpus(args.count, args.seed, args.processes)
+    results = run_benchmark(puzzles)
+    previous = None
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)['results']
+    print_results(results, previous)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'python': platform.python_version(), 'count': args.count, 'seed': args.seed,
+                       'results': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
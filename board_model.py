@@ -0,0 +1,237 @@
+from array import array
+
+
+def digit_mask(digit):
+    """Return a candidate mask with only the given digit set."""
+    return 1 << (digit - 1)
+
+
+def mask_positions(mask):
+    """Return a list of indexes of bits set in a mask, in ascending order."""
+    positions = []
+    position = 0
+    while mask:
+        if mask & 1:
+            positions.append(position)
+        mask >>= 1
+        position += 1
+    return positions
+
+
+def mask_digits(mask):
+    """Return a list of digits stored in a candidate mask, in ascending order."""
+    return [position + 1 for position in mask_positions(mask)]
+
+
+SYMBOLS = '123456789ABCDEFGHIJKLMNOP'  # Digit d is written as SYMBOLS[d - 1], so boards up to 25x25 fit
+BOX_SIZES = (2, 3, 4, 5)  # Supported box sizes: 4x4, 9x9, 16x16 and 25x25 boards
+
+
+class Layout:
+    """
+    Lookup tables of a board with n x n boxes (squares), built once per box size. The board has n^2 rows, columns
+    and squares of n^2 cells each. Units are numbered from 0 for rows, then columns, then squares,
+    and hold cell indexes in ascending order. Digits of a cell are kept in an n^2-bit candidate mask.
+    """
+
+    def __init__(self, box_size):
+        """
+        :param box_size: side of a square, e.g. 3 for a 9x9 board.
+        """
+        if box_size not in BOX_SIZES:
+            raise ValueError(f'Box size has to be one of {BOX_SIZES}, got {box_size}')
+        size = box_size * box_size
+        self.box_size = box_size
+        self.size = size  # Number of digits, and of cells in a unit
+        self.cells = size * size
+        self.all_candidates = (1 << size) - 1
+        self.rows = tuple(tuple(row * size + col for col in range(size)) for row in range(size))
+        self.columns = tuple(tuple(row * size + col for row in range(size)) for col in range(size))
+        self.squares = tuple(tuple(index for index in range(self.cells) if self.square_of(index) == square)
+                             for square in range(size))
+        self.units = self.rows + self.columns + self.squares
+        self.cell_units = tuple((index // size, size + index % size, 2 * size + self.square_of(index))
+                                for index in range(self.cells))
+        self.cell_unit_positions = tuple(tuple(self.units[unit].index(index) for unit in self.cell_units[index])
+                                         for index in range(self.cells))
+        self.peers = tuple(tuple(sorted({peer for unit in self.cell_units[index] for peer in self.units[unit]}
+                                        - {index}))
+                           for index in range(self.cells))
+        self.peer_sets = tuple(frozenset(peers) for peers in self.peers)
+        self.all_units = (1 << len(self.units)) - 1  # Mask with a bit of every unit
+        self.cell_unit_masks = tuple(sum(1 << unit for unit in units) for units in self.cell_units)
+        # Box-line intersections (54 on a 9x9 board) as (square unit, line unit, square mask, line mask),
+        # where the masks hold positions of the intersection's cells within the square and within the line:
+        self.intersections = tuple(
+            (2 * size + square_id, line,
+             sum(1 << position for position, cell in enumerate(square) if cell in self.units[line]),
+             sum(1 << position for position, cell in enumerate(self.units[line]) if cell in square))
+            for square_id, square in enumerate(self.squares)
+            for line in sorted({unit for cell in square for unit in self.cell_units[cell][:2]}))
+        self._common_peers = {}  # (cell, other cell): cells seeing both, filled in on demand
+
+    def square_of(self, index):
+        """Return the square id (counted by rows) of a cell index."""
+        row, column = divmod(index, self.size)
+        return (row // self.box_size) * self.box_size + column // self.box_size
+
+    def common_peers(self, cell, other_cell):
+        """Return a tuple of cells seeing both given cells, computed once per pair of cells."""
+        key = (cell, other_cell) if cell < other_cell else (other_cell, cell)
+        peers = self._common_peers.get(key)
+        if peers is None:
+            peers = self._common_peers[key] = tuple(sorted(self.peer_sets[cell] & self.peer_sets[other_cell]))
+        return peers
+
+    def unit_name(self, unit):
+        """Return a readable name of a unit, e.g. 'row 1', counted from 1."""
+        return f"{('row', 'column', 'square')[unit // self.size]} {unit % self.size + 1}"
+
+    def cell_name(self, index):
+        """Return a readable name of a cell, e.g. 'r1c3', counted from 1."""
+        row, column = divmod(index, self.size)
+        return f'r{row + 1}c{column + 1}'
+
+
+_LAYOUTS = {}
+
+
+def get_layout(box_size=3):
+    """Return the Layout of a box size, building it on first use."""
+    layout = _LAYOUTS.get(box_size)
+    if layout is None:
+        layout = _LAYOUTS[box_size] = Layout(box_size)
+    return layout
+
+
+def box_size_of(cells):
+    """Return the box size of a board with a given number of cells, e.g. 3 for 81. Raise ValueError if none fits."""
+    for box_size in BOX_SIZES:
+        if box_size ** 4 == cells:
+            return box_size
+    raise ValueError(f'Expected {" or ".join(str(box_size ** 4) for box_size in BOX_SIZES)} cells, got {cells}')
+
+
+# Lookup tables of the standard 9x9 board, built once at import. Units are numbered 0-8 for rows, 9-17 for columns
+# and 18-26 for 3x3 squares.
+STANDARD = get_layout(3)
+SQUARES = STANDARD.squares
+UNITS = STANDARD.units
+CELL_UNITS = STANDARD.cell_units
+PEERS = STANDARD.peers
+
+
+class InvalidBoard(Exception):
+    """
+    Raised as soon as a contradiction is found on a board: an empty cell without possible values,
+    a digit without a place left in a unit, or a digit placed twice in a unit.
+    """
+
+    def __init__(self, reason, cell=None, unit=None, digit=None, layout=STANDARD):
+        """
+        :param reason: description of the contradiction.
+        :param cell: index of the offending cell, if any.
+        :param unit: id of the offending unit (see Layout), if any.
+        :param digit: offending digit, if any.
+        :param layout: Layout of the board, used to name the cell and the unit.
+        """
+        self.reason = reason
+        self.cell = cell
+        self.unit = unit
+        self.digit = digit
+        details = []
+        if cell is not None:
+            details.append(layout.cell_name(cell))
+        if unit is not None:
+            details.append(layout.unit_name(unit))
+        if digit is not None:
+            details.append(f'digit {digit}')
+        super().__init__(f"Board is invalid! {reason} ({', '.join(details)})" if details else
+                         f'Board is invalid! {reason}')
+
+
+class SudokuBoard:
+    """
+    A headless model of a Sudoku board, independent of the Tk interface. A standard board is 9x9,
+    other sizes (4x4, 16x16, 25x25) are set by the box size. Cells are indexed from 0 by rows.
+    Every cell holds its value (0 for an empty cell) and a mask of its possible values.
+    """
+
+    def __init__(self, values=None, box_size=3):
+        """
+        Set board's attributes.
+
+        :param values: optional list of digits by rows, 0 for an empty cell.
+        :param box_size: side of a square, e.g. 4 for a 16x16 board.
+        """
+        self.layout = get_layout(box_size)
+        self.values = list(values) if values is not None else [0] * self.layout.cells
+        if len(self.values) != self.layout.cells:
+            raise ValueError(f'Expected {self.layout.cells} cells, got {len(self.values)}')
+        self.candidates = [digit_mask(value) if value else self.layout.all_candidates for value in self.values]
+
+    @property
+    def size(self):
+        """Number of rows, columns and digits, e.g. 9."""
+        return self.layout.size
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Create a board from a list of rows like those in sudoku_boards.py. The box size follows from the row count.
+        :param rows: list of rows, each holding digits or None for an empty cell.
+        """
+        values = [digit or 0 for row in rows for digit in row]
+        return cls(values, box_size_of(len(values)))
+
+    @classmethod
+    def from_string(cls, text):
+        """
+        Create a board from a string by rows, e.g. a single line of a puzzle file: 81 characters for a 9x9 board,
+        256 for 16x16 and so on. Digits above 9 are written as letters (see SYMBOLS).
+        Empty cells are marked with '0' or '.', whitespace is ignored.
+        """
+        text = ''.join(text.split()).upper()
+        box_size = box_size_of(len(text))
+        try:
+            return cls([0 if char in '.0' else SYMBOLS.index(char) + 1 for char in text], box_size)
+        except ValueError:
+            raise ValueError(f'Unexpected characters in {text!r}') from None
+
+    def to_string(self):
+        """Return the board as a string by rows, with '.' for empty cells."""
+        return ''.join(SYMBOLS[value - 1] if value else '.' for value in self.values)
+
+    def to_rows(self):
+        """Return the board as a list of rows, with None for empty cells."""
+        size = self.layout.size
+        return [[value or None for value in self.values[row * size:row * size + size]] for row in range(size)]
+
+    def place(self, index, digit):
+        """Fill a cell with a digit. The cell's possible values are reduced to that digit."""
+        self.values[index] = digit
+        self.candidates[index] = digit_mask(digit)
+
+    def possible_values(self, index):
+        """Return a list of possible values of a cell."""
+        return mask_digits(self.candidates[index])
+
+    def snapshot(self):
+        """Return the board's values followed by its possible values as one flat buffer, copied in one step."""
+        buffer = array('L', self.values)
+        buffer.extend(self.candidates)
+        return buffer
+
+    def restore(self, snapshot):
+        """Bring back values and possible values saved by snapshot(). The lists are updated in place."""
+        cells = self.layout.cells
+        self.values[:] = snapshot[:cells]
+        self.candidates[:] = snapshot[cells:]
+
+    def copy(self):
+        """Return an independent copy of the board."""
+        board = SudokuBoard.__new__(SudokuBoard)
+        board.layout = self.layout
+        board.values = self.values.copy()
+        board.candidates = self.candidates.copy()
+        return board
@@ -0,0 +1,172 @@
+"""
+Compact binary corpus of 9x9 puzzles, read through a memory map. For example:
+
+    python corpus.py puzzles.txt puzzles.sdc
+
+A file starts with a 16-byte header: the MAGIC bytes, the format version, the record size and the number
+of puzzles, little-endian. Records follow, 41 bytes per puzzle: two cells per byte by rows, the first cell
+in the high 4 bits, 0 for an empty cell. Records have a fixed size, so the offset of puzzle i follows from
+its number and no separate index is needed. Worker processes opening the same file share its page cache.
+"""
+import argparse
+import mmap
+import struct
+
+MAGIC = b'SUDC'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQ')  # magic, version, record size, number of puzzles
+CELLS = 81
+RECORD_SIZE = (CELLS + 1) // 2  # 41 bytes
+
+# '1'-'9' are mapped to their values, '0' and '.' to 0 and any other byte to 0xff:
+_CELL_VALUES = bytes('0123456789'.index(chr(char)) if chr(char) in '0123456789' else 0 if char == ord('.') else 0xff
+                     for char in range(256))
+# Every byte of a record decoded to the two cells it holds:
+_NIBBLE_CHARS = '.123456789??????'  # values above 9 only come from a damaged file, and fail to parse
+_CHAR_PAIRS = tuple(_NIBBLE_CHARS[byte >> 4] + _NIBBLE_CHARS[byte & 15] for byte in range(256))
+_VALUE_PAIRS = tuple((byte >> 4, byte & 15) for byte in range(256))
+
+
+def pack_puzzle(puzzle):
+    """
+    Pack a puzzle into a record.
+
+    :param puzzle: 81-character puzzle string with '0' or '.' for empty cells, or a list of 81 values.
+    :return: bytes of a record.
+    """
+    if isinstance(puzzle, str):
+        values = puzzle.strip().encode('ascii', 'replace').translate(_CELL_VALUES)
+    else:
+        values = bytes(puzzle)
+    if len(values) != CELLS or max(values) > 9:
+        raise ValueError(f'Expected 81 cells of digits, got {puzzle!r}')
+    values += b'\0'
+    return bytes(values[cell] << 4 | values[cell + 1] for cell in range(0, CELLS, 2))
+
+
+def write_corpus(path, puzzles):
+    """
+    Write puzzles to a corpus file, streaming them one by one.
+
+    :param path: path of the file, overwritten if it exists.
+    :param puzzles: iterable of puzzles, see pack_puzzle.
+    :return: number of puzzles written.
+    """
+    count = 0
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, 0))
+        for puzzle in puzzles:
+            file.write(pack_puzzle(puzzle))
+            count += 1
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, count))
+    return count
+
+
+class Corpus:
+    """
+    Read-only access to a corpus file through a memory map. Puzzles are read on demand, so opening a corpus
+    costs the same for any number of puzzles. Indexing and iteration return puzzle strings, as read by
+    SudokuBoard.from_string, and slices of records are available as NumPy views.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path of a file written by write_corpus.
+        """
+        with open(path, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.buffer) < HEADER.size:
+            self.buffer.close()
+            raise ValueError(f'{path} is not a puzzle corpus')
+        magic, version, record_size, self.count = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+            self.buffer.close()
+            raise ValueError(f'{path} is not a puzzle corpus of version {VERSION}')
+        if len(self.buffer) < HEADER.size + self.count * RECORD_SIZE:
+            self.buffer.close()
+            raise ValueError(f'{path} is truncated, expected {self.count} puzzles')
+        self.records_view = memoryview(self.buffer)[HEADER.size:HEADER.size + self.count * RECORD_SIZE]
+
+    def __len__(self):
+        return self.count
+
+    def record(self, index):
+        """Return the packed record of a puzzle as a memoryview of the file, without copying it."""
+        if not -self.count <= index < self.count:
+            raise IndexError(f'Puzzle {index} out of range of {self.count}')
+        start = index % self.count * RECORD_SIZE
+        return self.records_view[start:start + RECORD_SIZE]
+
+    def values(self, index):
+        """Return the values of a puzzle as a list of 81 values by rows, 0 for empty cells."""
+        values = []
+        for byte in self.record(index):
+            values.extend(_VALUE_PAIRS[byte])
+        return values[:CELLS]
+
+    def __getitem__(self, index):
+        """Return a puzzle as an 81-character string with '.' for empty cells."""
+        return ''.join([_CHAR_PAIRS[byte] for byte in self.record(index)])[:CELLS]
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    def records(self, start=0, stop=None):
+        """
+        Return records of puzzles from start to stop as an (N, 41) uint8 NumPy array viewing the memory map.
+        Requires NumPy, which is only imported here, so reading puzzles one by one does not load it.
+        """
+        import numpy as np
+
+        start, stop, _ = slice(start, stop).indices(self.count)
+        stop = max(start, stop)
+        return np.frombuffer(self.records_view[start * RECORD_SIZE:stop * RECORD_SIZE],
+                             dtype=np.uint8).reshape(-1, RECORD_SIZE)
+
+    def values_array(self, start=0, stop=None):
+        """
+        Return values of puzzles from start to stop as an (N, 81) int8 array, e.g. for vectorized.solve_values.
+        Unlike records(), the array is a new one, since unpacking the cells has to copy them. Requires NumPy.
+        """
+        import numpy as np
+
+        records = self.records(start, stop)
+        values = np.empty((len(records), RECORD_SIZE * 2), dtype=np.int8)
+        values[:, 0::2] = records >> 4
+        values[:, 1::2] = records & 15
+        return values[:, :CELLS]
+
+    def close(self):
+        """
+        Release the memory map. Puzzles can no longer be read afterwards. If memoryviews returned by record()
+        or NumPy views returned by records() are still alive, the file stays mapped until they are dropped.
+        """
+        self.records_view.release()
+        try:
+            self.buffer.close()
+        except BufferError:
+            pass  # unmapped once the last view of it is garbage collected
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    from solve import parse_puzzles, read_lines
+
+    parser = argparse.ArgumentParser(description='Convert 9x9 puzzles from text files into a binary corpus.')
+    parser.add_argument('inputs', nargs='+', help="text files of puzzles, '-' for the standard input")
+    parser.add_argument('output', help='corpus file to write')
+    args = parser.parse_args()
+
+    count = write_corpus(args.output, parse_puzzles(read_lines(args.inputs)))
+    print(f'Wrote {count} puzzles to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
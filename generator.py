@@ -0,0 +1,123 @@
+"""
+Puzzle generator, grading puzzles by the hardest technique SudokuSolver needs. For example:
+
+    python generator.py --count 1000 --difficulty x_wing --output x_wing_puzzles.txt
+"""
+import argparse
+import os
+import random
+from multiprocessing import Pool
+
+from board_model import SQUARES, SudokuBoard
+from search import count_solutions, search
+from SudokuSolver import SudokuSolver
+
+SEARCH = 'search'  # grade of puzzles which logical techniques cannot solve
+# Every grade a puzzle can get, from the easiest: techniques of the Solver by their names without 'check_':
+GRADES = tuple(technique.__name__.replace('check_', '') for technique in SudokuSolver(SudokuBoard()).techniques
+               ) + (SEARCH,)
+SEEDS_PER_PUZZLE = 1000  # default bound of seeds tried per requested puzzle of a given grade
+
+
+def full_grid(rng):
+    """Return a random solved grid as a list of 81 values. Diagonal squares are filled at random first."""
+    board = SudokuBoard()
+    for square in (SQUARES[0], SQUARES[4], SQUARES[8]):
+        for cell, digit in zip(square, rng.sample(range(1, 10), 9)):
+            board.place(cell, digit)
+    return search(board)
+
+
+def remove_clues(solution, rng):
+    """Remove clues of a solved grid in random order, as long as the puzzle keeps a unique solution."""
+    values = solution.copy()
+    cells = list(range(81))
+    rng.shuffle(cells)
+    for cell in cells:
+        digit = values[cell]
+        values[cell] = 0
+        if count_solutions(SudokuBoard(values), 2) != 1:
+            values[cell] = digit
+    return values
+
+
+def grade(values):
+    """
+    Return the name of the hardest technique needed to solve a puzzle with SudokuSolver, e.g. 'hidden_singles'.
+    Techniques are tried from the cheapest, so the hardest one making progress is needed.
+    Puzzles which the techniques cannot solve are graded as SEARCH.
+    """
+    solver = SudokuSolver(SudokuBoard(values))
+    if not solver.solve(fallback=False):
+        return SEARCH
+    hardest = 0
+    for level, technique in enumerate(solver.techniques):
+        stats = solver.stats.techniques.get(technique.__name__)
+        if stats and stats.placements + stats.eliminations:
+            hardest = level
+    return solver.techniques[hardest].__name__.replace('check_', '')
+
+
+def generate_puzzle(seed):
+    """Generate a single puzzle from a seed. Return a tuple of the puzzle string and its grade."""
+    rng = random.Random(seed)
+    values = remove_clues(full_grid(rng), rng)
+    return SudokuBoard(values).to_string(), grade(values)
+
+
+def generate_puzzles(count, difficulty=None, processes=None, seed=0, chunksize=4, max_seeds=None):
+    """
+    Generate puzzles across a pool of worker processes and stream them back in order of their seeds.
+    Rare grades may need many seeds, so at most max_seeds of them are tried, and fewer than count
+    puzzles are yielded if they run out.
+
+    :param count: number of puzzles to generate.
+    :param difficulty: if given, only puzzles of that grade are yielded, e.g. 'x_wing'. See GRADES.
+    :param processes: number of worker processes, all cores by default.
+    :param seed: first seed; every puzzle is generated from a consecutive seed, so results are reproducible.
+    :param chunksize: number of seeds sent to a worker at once.
+    :param max_seeds: maximum number of seeds to try, count * SEEDS_PER_PUZZLE by default.
+    :return: generator of (puzzle, grade) tuples.
+    """
+    if difficulty is not None and difficulty not in GRADES:
+        raise ValueError(f"Unknown difficulty {difficulty!r}, expected one of {', '.join(GRADES)}")
+    if max_seeds is None:
+        max_seeds = count * SEEDS_PER_PUZZLE
+    generated = 0
+    last_seed = seed + max_seeds
+    with Pool(processes) as pool:
+        batch_size = chunksize * (processes or os.cpu_count() or 1) * 4
+        while generated < count and seed < last_seed:
+            seeds = range(seed, min(seed + batch_size, last_seed))
+            seed += batch_size
+            for puzzle, puzzle_grade in pool.imap(generate_puzzle, seeds, chunksize):
+                if difficulty is None or puzzle_grade == difficulty:
+                    yield puzzle, puzzle_grade
+                    generated += 1
+                    if generated == count:
+                        return
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate Sudoku puzzles graded by the hardest technique needed.')
+    parser.add_argument('--count', type=int, default=100, help='number of puzzles to generate')
+    parser.add_argument('--difficulty', choices=GRADES, help='grade of puzzles to keep')
+    parser.add_argument('--processes', type=int, help='number of worker processes, all cores by default')
+    parser.add_argument('--seed', type=int, default=0, help='first seed used by the generator')
+    parser.add_argument('--max-seeds', type=int, help='maximum number of seeds to try, 1000 per puzzle by default')
+    parser.add_argument('--output', required=True, help='file to which puzzles are written, one per line')
+    args = parser.parse_args()
+
+    generated = 0
+    with open(args.output, 'w') as file:
+        for puzzle, _ in generate_puzzles(args.count, args.difficulty, args.processes, args.seed,
+                                          max_seeds=args.max_seeds):
+            file.write(puzzle + '\n')
+            file.flush()
+            generated += 1
+    if generated < args.count:
+        print(f'Only {generated} puzzles found within the seed limit')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,21 @@
+import queue
+import threading
 from tkinter import *
-from SudokuSolver import SudokuSolver
+from SudokuSolver import SolveCancelled, SudokuSolver
+from board_model import SYMBOLS, InvalidBoard, SudokuBoard
 from sudoku_boards import *
 
 # Settings:
-SIDE = 100
+BOX_SIZE = 3  # 2, 3, 4 or 5 for 4x4, 9x9, 16x16 or 25x25 boards
+SIZE = BOX_SIZE * BOX_SIZE
+SIDE = 900 // SIZE
 MARGIN = 50
-WIDTH = 9 * SIDE + 2 * MARGIN
+WIDTH = SIZE * SIDE + 2 * MARGIN
 HEIGHT = WIDTH
 
-BOARD_TO_LOAD = EXPERT_BOARD_2
+BOARD_TO_LOAD = EXPERT_BOARD_2  # has to be of the board size set above, e.g. BOARD_16X16 for BOX_SIZE = 4
+SOLVER_UPDATE_INTERVAL = 50  # ms between applying batches of digits found by the Solver
+SOLVED_DIGIT_COLORS = {'singles': 'slate grey', 'hidden_singles': 'green', 'search': 'dark orange'}  # by technique
 
 
 class Board(Frame):
@@ -16,7 +23,8 @@ class Board(Frame):
     This class is the main frame of the application which holds the whole content.
     It contains functions which draw Sudoku board and all necessary components as well as
     methods that allow the user to perform actions within the app. Sudoku board is divided
-    into 9x9 cells, and cells are segregated by clusters, which are rows, columns and 3x3 squares.
+    into SIZE x SIZE cells (9x9 by default), and cells are segregated by clusters, which are rows, columns
+    and BOX_SIZE x BOX_SIZE squares.
     """
 
     def __init__(self, master):
@@ -39,6 +47,11 @@ class Board(Frame):
                                    relief="flat", command=self.solve)
         self.solve_button.pack(fill=BOTH, expand=True, side=TOP)
 
+        self.cancel_button = Button(self, text='Cancel', width=24, bd=3, bg='grey40', fg='white',
+                                    activebackground='grey30', activeforeground='white', font=('Script', 10, 'bold'),
+                                    relief="flat", state=DISABLED, command=self.cancel_solving)
+        self.cancel_button.pack(fill=BOTH, expand=True, side=TOP)
+
         self.undo_button = Button(self, text='Undo', width=24, bd=3, bg='RoyalBlue2', fg='white',
                                   activebackground='RoyalBlue3', activeforeground='white', font=('Script', 10, 'bold'),
                                   relief="flat", command=self.undo)
@@ -63,6 +76,10 @@ class Board(Frame):
                                     justify=CENTER, command=self.change_checkbutton_label)
         self.checkbox.pack(fill=BOTH)
 
+        self.progress_label = Label(self, text='', bd=0, pady=10, bg='dim grey', fg='white',
+                                    font=('Script', 8, 'bold'))
+        self.progress_label.pack(fill=BOTH)
+
         # Create cells and organise them:
         self.draw_grid()
         self.cells = []  # Used as 'rows' in Solver
@@ -71,6 +88,7 @@ class Board(Frame):
         self.create_cells()
         self.create_columns()
         self.create_squares()
+        self.canvas.create_rectangle(0, 0, 0, 0, tags='highlight', outline='RoyalBlue2', width=7)  # moved by cells
         self.current_cell = self.cells[0][0]
         self.current_cell.highlight()
         self.load_board(BOARD_TO_LOAD)
@@ -80,6 +98,15 @@ class Board(Frame):
         self.is_solved = False
         self.is_auto_switching = True
 
+        # Solving in the background:
+        self.solver = None
+        self.solver_thread = None
+        self.solver_error = None
+        self.solver_updates = queue.SimpleQueue()  # (index, digit, technique) put by the worker thread
+        self.cells_to_solve = 0
+        self.solved_cells = 0
+        self.record_solve_undo = True
+
         # Bind necessary keys:
         self.canvas.focus_set()
         self.canvas.bind("<Button-1>", self.choose_cell)
@@ -94,14 +121,14 @@ class Board(Frame):
 
     def draw_grid(self):
         """
-        Draw a 9x9 Sudoku grid on the canvas. Every third line starting from the first line
+        Draw a SIZE x SIZE Sudoku grid on the canvas. Every BOX_SIZE-th line starting from the first line
         of the grid's rows and columns is bold.
         """
-        for line_nr in range(10):
-            # change color and line width for every 3rd line:
+        for line_nr in range(SIZE + 1):
+            # change color and line width for every BOX_SIZE-th line:
             color = 'grey'
             line_width = 1
-            if (line_nr + 3) % 3 == 0:
+            if line_nr % BOX_SIZE == 0:
                 color = 'black'
                 line_width = 3
 
@@ -122,10 +149,10 @@ class Board(Frame):
         Create an instance of Cell class for every square of the grid and assign coordinates.
         Append all the cells to the list (segregated by rows).
         """
-        for row_nr in range(9):
+        for row_nr in range(SIZE):
             row = []
 
-            for col_nr in range(9):
+            for col_nr in range(SIZE):
                 x1 = MARGIN + col_nr * SIDE
                 y1 = MARGIN + row_nr * SIDE
                 x2 = x1 + SIDE
@@ -146,13 +173,13 @@ class Board(Frame):
             self.columns.append(column)
 
     def create_squares(self):
-        """Reorganise cells into a list of 3x3 squares."""
+        """Reorganise cells into a list of BOX_SIZE x BOX_SIZE squares."""
         square_id = 0
-        for square_x in range(0, 9, 3):  # for 0, 3 and 6
-            for square_y in range(0, 9, 3):
+        for square_x in range(0, SIZE, BOX_SIZE):  # for 0, 3 and 6 on a 9x9 board
+            for square_y in range(0, SIZE, BOX_SIZE):
                 square = []
-                for row in range(square_x, square_x + 3):  # (0, 3), (3, 6) and (6, 9)
-                    for col in range(square_y, square_y + 3):
+                for row in range(square_x, square_x + BOX_SIZE):  # (0, 3), (3, 6) and (6, 9)
+                    for col in range(square_y, square_y + BOX_SIZE):
                         cell = self.cells[row][col]
                         cell.square_id = square_id
                         square.append(cell)
@@ -168,8 +195,7 @@ class Board(Frame):
         y = click_coord.y
 
         for row in self.cells:
-            for col in range(9):
-                cell = row[col]
+            for cell in row:
                 if cell.x1 <= x <= cell.x2 and cell.y1 <= y <= cell.y2:
                     cell.highlight()
                     self.current_cell = cell
@@ -182,18 +208,20 @@ class Board(Frame):
         Set possible values for the filled cell as an empty list.
         Removes previous value if existed.
 
-        :param key_press: a value of a key pressed. Only digits from 1 to 9 pass the conditions.
+        :param key_press: a value of a key pressed. Only digits from 1 to 9 pass the conditions,
+        and letters for digits above 9 on bigger boards (see SYMBOLS).
         """
-        if not self.is_solved:
-            key_char = key_press.char
-            if key_char.isdigit() and int(key_char) != 0:
+        if not self.is_solved and not self.solver_thread:
+            key_char = key_press.char.upper()
+            if key_char and key_char in SYMBOLS[:SIZE]:
+                digit = SYMBOLS.index(key_char) + 1
                 # update undo_list with the current action
-                if int(key_char) != self.current_cell.value:
+                if digit != self.current_cell.value:
                     previous_cell = self.current_cell
                     previous_value = self.current_cell.value
                     self.undo_list.append(('value', previous_cell, previous_value))
 
-                self.current_cell.show_digit(int(key_char), 'black')
+                self.current_cell.show_digit(digit, 'black')
                 self.current_cell.possible_values = []
                 self.auto_switch()
 
@@ -215,7 +243,7 @@ class Board(Frame):
         If current cell is utmost, jump to the first cell of the next row.
         """
         if self.is_auto_switching:
-            if self.current_cell.list_coord[1] == 8:
+            if self.current_cell.list_coord[1] == SIZE - 1:
                 self.switch_cells_with_arrows('Right')
                 self.switch_cells_with_arrows('Down')
             else:
@@ -227,16 +255,14 @@ class Board(Frame):
         Change cell variables to that of an empty cell.
         Update undo list with digit-removing action.
         """
-        if not self.is_solved:
+        if not self.is_solved and not self.solver_thread:
             # update undo_list with the current action
             if self.current_cell.value is not None:
                 previous_cell = self.current_cell
                 previous_value = self.current_cell.value
                 self.undo_list.append(('value', previous_cell, previous_value))
 
-                self.canvas.delete(self.current_cell.unique_tag)
-                self.current_cell.value = None
-                self.current_cell.possible_values = [1, 2, 3, 4, 5, 6, 7, 8, 9]
+                self.current_cell.reset()
         self.auto_switch()
 
     def switch_cells_with_arrows(self, arrow_press):
@@ -272,44 +298,118 @@ class Board(Frame):
             list_col = self.current_cell.list_coord[1]
 
         if list_row < 0:
-            list_row = 8
-        elif list_row > 8:
+            list_row = SIZE - 1
+        elif list_row > SIZE - 1:
             list_row = 0
 
         if list_col < 0:
-            list_col = 8
-        elif list_col > 8:
+            list_col = SIZE - 1
+        elif list_col > SIZE - 1:
             list_col = 0
 
         new_current_cell = self.cells[list_row][list_col]
         new_current_cell.highlight()
         self.current_cell = new_current_cell
 
-    def solve(self):
+    def solve(self, record_undo=True):
+        """
+        Assigned for solving button. Create an instance of SudokuSolver class for a headless copy of the Board
+        and run it on a worker thread, so that the window stays responsive.
+        Digits found by the Solver are displayed in batches by apply_solver_updates.
+        Show exception for invalid board which is raised by the Solver.
+
+        :param record_undo: whether to add solving action to undo list once the Board is solved.
+        """
+        if self.solver_thread:
+            return
+        board = SudokuBoard.from_rows([[cell.value for cell in row] for row in self.cells])
+        try:
+            self.solver = SudokuSolver(board, on_place=lambda *update: self.solver_updates.put(update))
+        except InvalidBoard as inst:
+            show_pop_up('Invalid board', inst.args[0])
+            return
+
+        self.solver_error = None
+        self.record_solve_undo = record_undo
+        self.cells_to_solve = board.values.count(0)
+        self.solved_cells = 0
+        self.solver_thread = threading.Thread(target=self.run_solver, daemon=True)
+        self.cancel_button['state'] = NORMAL
+        self.progress_label['text'] = 'Solving...'
+        self.solver_thread.start()
+        self.after(SOLVER_UPDATE_INTERVAL, self.apply_solver_updates)
+
+    def run_solver(self):
+        """Solve the headless board on the worker thread. Tk widgets must not be touched here."""
+        try:
+            self.solver.solve()
+        except (InvalidBoard, SolveCancelled) as inst:
+            self.solver_error = inst
+
+    def apply_solver_updates(self):
         """
-        Assigned for solving button. Create an instance of SudokuSolver class which solves
-        the Board while initiated.
-        Add solving action to undo list.
-        Change Board status to "solved".
-        Show exception for invalid board which is raised by the Solver. If an exception occurs,
-        clear the board.
+        Display all digits found by the Solver since the last call and update progress.
+        Repeat periodically until the worker thread finishes.
         """
-        # try:
-        solver = SudokuSolver(self.cells, self.columns, self.squares)
-        solver.solve()
+        is_running = self.solver_thread.is_alive()  # checked first, so no digit put before finishing is missed
+        while not self.solver_updates.empty():
+            self.show_solved_digit(*self.solver_updates.get())
+            self.solved_cells += 1
+
+        if is_running:
+            self.progress_label['text'] = f'Solving... {self.solved_cells}/{self.cells_to_solve} cells'
+            self.after(SOLVER_UPDATE_INTERVAL, self.apply_solver_updates)
+        else:
+            self.finish_solving()
+
+    def finish_solving(self):
+        """
+        Add solving action to undo list and change Board status to "solved".
+        If solving was cancelled or the board is invalid, remove digits found by the Solver.
+        """
+        self.solver_thread = None
+        self.cancel_button['state'] = DISABLED
+
+        if self.solver_error:
+            for row in self.cells:
+                for cell in row:
+                    if len(cell.possible_values) == 1:
+                        cell.reset()
+            if isinstance(self.solver_error, SolveCancelled):
+                self.progress_label['text'] = 'Cancelled'
+            else:
+                self.progress_label['text'] = ''
+                show_pop_up('Invalid board', self.solver_error.args[0])
+            return
+
         # update undo_list with the current action
-        if not self.is_solved:
+        if not self.is_solved and self.record_solve_undo:
             self.undo_list.append(('solve',))
 
         self.is_solved = True
+        self.progress_label['text'] = 'Solved'
+
+    def cancel_solving(self):
+        """Assigned for cancel button. Stop the Solver running on the worker thread."""
+        if self.solver_thread:
+            self.solver.cancel()
 
-        # except Exception as inst:
-        #     print(inst.args[0])
-        #     self.clear_board()
+    def show_solved_digit(self, index, digit, technique):
+        """
+        Display a digit found by the Solver in the corresponding cell.
+        Solved cells keep their digit as the only possible value.
+
+        :param index: cell index (by rows) within the headless board.
+        :param digit: digit found by the Solver.
+        :param technique: name of the solving technique used, which determines the color.
+        """
+        cell = self.cells[index // SIZE][index % SIZE]
+        cell.show_digit(digit, SOLVED_DIGIT_COLORS.get(technique, 'slate grey'))
+        cell.possible_values = [digit]
 
     def undo(self):
         """Depending on the type of action saved in the undo list, reset the state of the board."""
-        if self.undo_list:
+        if self.undo_list and not self.solver_thread:
             last_move = self.undo_list[-1]
 
             if last_move[0] == 'value':
@@ -325,8 +425,7 @@ class Board(Frame):
                     self.current_cell.reset()
 
             elif last_move[0] == 'clear':
-                self.solve()
-                self.undo_list.pop(-1)  # removes two items from the list since self.solve adds an extra one
+                self.solve(record_undo=False)
 
             elif last_move[0] == 'solve':
                 self.clear_board()
@@ -334,19 +433,18 @@ class Board(Frame):
 
 
             elif last_move[0] == 'reset':
-                new_board = last_move[1]
+                snapshot = last_move[1]
                 was_solved = False  # checks for 'solve + reset' situation
-                for row_nr in range(9):
-                    for col_nr in range(9):
-                        digit = new_board[row_nr][col_nr]
-                        cell = self.cells[row_nr][col_nr]
-                        if cell.possible_values != 9:
-                            was_solved = True
-                        cell.value = digit
-                        if digit is not None:
-                            cell.show_digit(digit)
-                        else:
-                            cell.reset()
+                for index in range(SIZE * SIZE):
+                    digit = snapshot[index] or None
+                    cell = self.cells[index // SIZE][index % SIZE]
+                    if cell.possible_values != SIZE:
+                        was_solved = True
+                    cell.value = digit
+                    if digit is not None:
+                        cell.show_digit(digit)
+                    else:
+                        cell.reset()
                 if was_solved:
                     self.undo_list.pop(-1)
 
@@ -354,6 +452,8 @@ class Board(Frame):
 
     def clear_board(self):
         """Clear the board from solved digits (initially inserted digits remain) and update undo list."""
+        if self.solver_thread:
+            return
         self.is_solved = False
         is_cleared = False
 
@@ -369,21 +469,15 @@ class Board(Frame):
 
     def reset_board(self):
         """Reset the Board to an empty state and update undo list."""
+        if self.solver_thread:
+            return
         self.is_solved = False
 
         # update undo_list with the current action:
-        previous_board = []
-        for row in self.cells:
-            previous_row = []
-            for col_nr in range(len(row)):
-                cell = row[col_nr]
-                if len(cell.possible_values) != 9:  # if a cell was solved by the solver
-                    value = None
-                else:
-                    value = cell.value
-                previous_row.append(value)
-            previous_board.append(previous_row)
-        self.undo_list.append(('reset', previous_board))
+        # (kept as a flat board snapshot, skipping cells solved by the solver)
+        previous_board = SudokuBoard.from_rows([[None if len(cell.possible_values) != SIZE else cell.value
+                                                 for cell in row] for row in self.cells])
+        self.undo_list.append(('reset', previous_board.snapshot()))
 
         # reset board:
         for row in self.cells:
@@ -395,8 +489,8 @@ class Board(Frame):
         Load a prepared board from sudoku_boards.py.
         :param board: board to be loaded.
         """
-        for row_nr in range(9):
-            for col_nr in range(9):
+        for row_nr in range(SIZE):
+            for col_nr in range(SIZE):
                 digit = board[row_nr][col_nr]
                 cell = self.cells[row_nr][col_nr]
                 cell.value = digit
@@ -420,38 +514,31 @@ class Cell:
         :param y2: y coordinate of bottom-right edge within the app window
         """
         self.value = None
-        self.possible_values = [1, 2, 3, 4, 5, 6, 7, 8, 9]
+        self.possible_values = list(range(1, SIZE + 1))
         self.list_coord = list_coord
-        self.square_id = None  # square index from cells list segregated by 3x3 squares
+        self.square_id = None  # square index from cells list segregated by BOX_SIZE x BOX_SIZE squares
         self.canvas = board
         self.x1 = x1
         self.y1 = y1
         self.x2 = x2
         self.y2 = y2
-        self.unique_tag = f'cell{self.x1}{self.y1}'  # Cannot be digit-only
+        # Text item created once and reused for every digit displayed in the cell:
+        self.text_item = self.canvas.create_text(x1 + SIDE / 2, y1 + SIDE / 2, text='', font=('Script', 15, 'bold'))
 
     def highlight(self):
-        """Draw a rectangle on cell's borders to highlight it. Delete previous highlight."""
-        self.canvas.delete('highlight')
-        self.canvas.create_rectangle(self.x1, self.y1, self.x2, self.y2, tags='highlight', outline='RoyalBlue2',
-                                     width=7)
+        """Move the Board's single highlight rectangle onto cell's borders."""
+        self.canvas.coords('highlight', self.x1, self.y1, self.x2, self.y2)
 
     def show_digit(self, digit, color='black'):
-        """
-        Delete previous currently displayed value and draw a new text widget.
-        Deletion is based on a unique tags assigned to digits in every cell.
-        """
-        self.canvas.delete(self.unique_tag)
-        x = self.x1 + SIDE / 2
-        y = self.y1 + SIDE / 2
+        """Display a digit by updating the cell's text item, replacing previously displayed value."""
         self.value = digit
-        self.canvas.create_text(x, y, text=str(digit), tags=self.unique_tag, fill=color, font=('Script', 15, 'bold'))
+        self.canvas.itemconfig(self.text_item, text=SYMBOLS[digit - 1], fill=color)
 
     def reset(self):
         """Reset cell's values to that of an empty cell"""
         self.value = None
-        self.possible_values = [1, 2, 3, 4, 5, 6, 7, 8, 9]
-        self.canvas.delete(self.unique_tag)
+        self.possible_values = list(range(1, SIZE + 1))
+        self.canvas.itemconfig(self.text_item, text='')
 
     def __str__(self):
         return self.list_coord
@@ -467,10 +554,17 @@ def show_pop_up(title, label_text, button_text='OK'):
            relief="flat", command=pop_up.destroy).place(relx=0.5, rely=0.65, anchor='center')
 
 
-root = Tk()
-root.title("Sudoku Solver")
-root.geometry(f'{int(WIDTH * 1.3)}x{HEIGHT}')
+def main():
+    """Open the main window. Kept out of the module level, so that importing this module does not start Tk."""
+    global root
+    root = Tk()
+    root.title("Sudoku Solver")
+    root.geometry(f'{int(WIDTH * 1.3)}x{HEIGHT}')
+
+    app = Board(root)
+
+    root.mainloop()
 
-app = Board(root)
 
-root.mainloop()
+if __name__ == '__main__':
+    main()
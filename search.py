@@ -0,0 +1,220 @@
+from itertools import count, islice
+from random import Random
+
+from board_model import STANDARD
+
+SEARCH_BUDGET = 256  # branches of a run of the randomized search, multiplied at restarts by the Luby sequence
+
+
+class SolveCancelled(Exception):
+    """Raised when solving is cancelled before it is finished."""
+
+
+class BudgetExhausted(Exception):
+    """Raised inside a run of the randomized search when it has taken all branches of its budget."""
+
+
+def luby(index):
+    """
+    Return the index-th term (from 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ...
+    Restarts with budgets following it waste at most a logarithmic factor over the best fixed budget.
+    """
+    while True:
+        power = 1
+        while power * 2 - 1 < index:
+            power *= 2
+        if power * 2 - 1 == index:
+            return power
+        index -= power - 1
+
+
+def assign(values, candidates, cell, digit, layout=STANDARD):
+    """
+    Fill a cell with a digit and remove it from possible values of its peers.
+    Every peer left with a single possible value is filled the same way.
+
+    :param values: list of cell values by rows, updated in place.
+    :param candidates: list of candidate masks by rows, updated in place.
+    :param layout: Layout of the board, a standard 9x9 one by default.
+    :return: False if the assignment leads to a contradiction, True otherwise.
+    """
+    peers = layout.peers
+    to_assign = [(cell, digit)]
+    while to_assign:
+        cell, digit = to_assign.pop()
+        if values[cell]:
+            if values[cell] != digit:
+                return False
+            continue
+        value = 1 << (digit - 1)
+        if not candidates[cell] & value:
+            return False
+        values[cell] = digit
+        candidates[cell] = value
+
+        for peer in peers[cell]:
+            if candidates[peer] & value:
+                if values[peer]:  # the digit is already placed in a peer
+                    return False
+                mask = candidates[peer] ^ value
+                if not mask:
+                    return False
+                candidates[peer] = mask
+                if not mask & (mask - 1):
+                    to_assign.append((peer, mask.bit_length()))
+    return True
+
+
+def assign_hidden_singles(values, candidates, layout=STANDARD):
+    """
+    Fill every digit which can only be placed in a single cell of a unit, until there are none left.
+
+    :return: False if a contradiction is found, e.g. a digit has no place left in a unit, True otherwise.
+    """
+    is_changed = True
+    while is_changed:
+        is_changed = False
+        for unit in layout.units:
+            once = twice = placed = 0
+            for cell in unit:
+                mask = candidates[cell]
+                if values[cell]:
+                    placed |= mask
+                else:
+                    twice |= once & mask
+                    once |= mask
+            if once | placed != layout.all_candidates:
+                return False
+            singles = once & ~twice & ~placed
+            while singles:
+                value = singles & -singles
+                singles ^= value
+                for cell in unit:
+                    if candidates[cell] & value:
+                        if not assign(values, candidates, cell, value.bit_length(), layout):
+                            return False
+                        break
+                is_changed = True
+    return True
+
+
+def _solutions(values, candidates, is_cancelled, layout, random=None, budget=None):
+    """
+    Depth-first search branching on the empty cell with the fewest possible values (MRV).
+    Hidden singles are filled at every step to prune the search.
+
+    :param random: optional Random instance. If given, ties between cells and the order of digits are random.
+    :param budget: optional one-item list of branches left. BudgetExhausted is raised once it runs out.
+    :return: generator of solutions, each a list of values by rows.
+    """
+    if is_cancelled is not None and is_cancelled():
+        raise SolveCancelled()
+    if not assign_hidden_singles(values, candidates, layout):
+        return
+    best_cells = []
+    best_count = layout.size + 1
+    for cell in range(layout.cells):
+        if not values[cell]:
+            cell_count = candidates[cell].bit_count()
+            if cell_count < best_count:
+                best_cells = [cell]
+                best_count = cell_count
+                if cell_count < 3 and random is None:
+                    break
+            elif cell_count == best_count:
+                best_cells.append(cell)
+    if not best_cells:
+        yield values
+        return
+
+    best_cell = best_cells[0] if random is None else random.choice(best_cells)
+    mask = candidates[best_cell]
+    digits = []
+    while mask:
+        value = mask & -mask
+        mask ^= value
+        digits.append(value.bit_length())
+    if random is not None:
+        random.shuffle(digits)
+    for digit in digits:
+        if budget is not None:
+            budget[0] -= 1
+            if budget[0] < 0:
+                raise BudgetExhausted()
+        branch_values = values.copy()
+        branch_candidates = candidates.copy()
+        if assign(branch_values, branch_candidates, best_cell, digit, layout):
+            yield from _solutions(branch_values, branch_candidates, is_cancelled, layout, random, budget)
+
+
+def _initial_state(board):
+    """
+    Return values, candidates and the Layout of a board with all its digits assigned, starting from the possible
+    values left by the logical techniques. Return None if the board is contradictory.
+    """
+    layout = board.layout
+    values = [0] * layout.cells
+    candidates = board.candidates.copy()
+    for cell in range(layout.cells):
+        if not board.values[cell]:
+            if not candidates[cell]:
+                return None
+        elif not assign(values, candidates, cell, board.values[cell], layout):
+            return None
+    return values, candidates, layout
+
+
+def search(board, is_cancelled=None):
+    """
+    Find a solution of a board, continuing from the possible values left by the logical techniques.
+    The board itself is not modified. Ties between cells and the order of digits are randomized, and the search
+    restarts whenever a run has taken its budget of branches, with budgets following the Luby sequence.
+    This bounds the time lost below an early wrong guess, e.g. on puzzles with many solutions. Restarts are
+    seeded, so the same solution is found every time.
+
+    :param board: SudokuBoard instance.
+    :param is_cancelled: optional callable checked at every step of the search. SolveCancelled is raised
+    once it returns True.
+    :return: list of values of a solution (by rows), or None if the board cannot be solved.
+    """
+    state = _initial_state(board)
+    if state is None:
+        return None
+    values, candidates, layout = state
+    for restart in count():
+        budget = [SEARCH_BUDGET * luby(restart + 1)]
+        try:
+            return next(_solutions(values.copy(), candidates.copy(), is_cancelled, layout, Random(restart), budget),
+                        None)
+        except BudgetExhausted:
+            pass
+
+
+def count_solutions(board, limit=2):
+    """
+    Count solutions of a board, stopping as soon as `limit` of them are found.
+    Possible values left by the logical techniques are used to prune the search. Like search(), the search is
+    randomized and restarted, and distinct solutions are collected over the runs, so that boards with many
+    solutions are told apart quickly. A run which ends within its budget has explored the whole tree,
+    which gives the exact count.
+
+    :param board: SudokuBoard instance, not modified.
+    :param limit: maximum number of solutions to look for.
+    :return: number of solutions, at most limit.
+    """
+    state = _initial_state(board)
+    if state is None:
+        return 0
+    values, candidates, layout = state
+    found = set()
+    for restart in count():
+        budget = [SEARCH_BUDGET * luby(restart + 1)]
+        try:
+            for solution in islice(_solutions(values.copy(), candidates.copy(), None, layout, Random(restart), budget),
+                                   limit):
+                found.add(tuple(solution))
+                if len(found) >= limit:
+                    return limit
+        except BudgetExhausted:
+            continue
+        return len(found)
@@ -0,0 +1,226 @@
+"""
+Solution cache in front of SudokuSolver, shared by puzzles equivalent under Sudoku symmetries:
+digit relabelling, row (column) permutations within bands (stacks), band (stack) permutations and transposition.
+
+Every puzzle is mapped to a canonical form, the lexicographically smallest grid among the transforms that
+sort bands, stacks, rows and columns by clue counts. Equivalent puzzles share the canonical form, so a solution
+stored for one of them is mapped back through the inverse transform for any other.
+"""
+import sqlite3
+from collections import OrderedDict
+from itertools import permutations, product
+
+from board_model import STANDARD, InvalidBoard, SudokuBoard
+from SudokuSolver import SudokuSolver
+
+MAX_TRANSFORMS = 5000  # above that, ties between lines are broken by their original order
+
+
+def _transpose(values):
+    return [values[column * 9 + row] for row in range(9) for column in range(9)]
+
+
+def _line_invariants(values):
+    """Return invariants of rows, unchanged by any transform which keeps rows as rows: clue count of a row
+    and sorted clue counts of columns crossing its clues."""
+    row_counts = [sum(1 for column in range(9) if values[row * 9 + column]) for row in range(9)]
+    column_counts = [sum(1 for row in range(9) if values[row * 9 + column]) for column in range(9)]
+    return [(row_counts[row], tuple(sorted(column_counts[column] for column in range(9) if values[row * 9 + column])))
+            for row in range(9)]
+
+
+def _sorted_orders(items, key, exhaustive):
+    """Return all orders of items sorted by key. If not exhaustive, only the stable-sorted one."""
+    ordered = sorted(items, key=key)
+    if not exhaustive:
+        return [tuple(ordered)]
+    groups = []
+    for item in ordered:
+        if groups and key(groups[-1][0]) == key(item):
+            groups[-1].append(item)
+        else:
+            groups.append([item])
+    return [sum(combination, ()) for combination in product(*(list(permutations(group)) for group in groups))]
+
+
+def _line_orders(invariants, exhaustive=True):
+    """Return orders of 9 lines (rows or columns) sorting bands, and lines within bands, by their invariants."""
+    band_invariants = [tuple(sorted(invariants[band * 3:band * 3 + 3])) for band in range(3)]
+    band_orders = _sorted_orders(range(3), band_invariants.__getitem__, exhaustive)
+    line_orders = [_sorted_orders(range(band * 3, band * 3 + 3), invariants.__getitem__, exhaustive)
+                   for band in range(3)]
+    return [sum(combination, ()) for band_order in band_orders
+            for combination in product(*(line_orders[band] for band in band_order))]
+
+
+def _relabel(values, rows, columns):
+    """Return a transformed grid with digits relabelled in order of first appearance, and the digits' mapping."""
+    mapping = {0: 0}
+    grid = []
+    for row in rows:
+        for column in columns:
+            value = values[row * 9 + column]
+            label = mapping.get(value)
+            if label is None:
+                label = mapping[value] = len(mapping)
+            grid.append(label)
+    return grid, mapping
+
+
+def canonicalize(values):
+    """
+    Find the canonical form of a puzzle.
+
+    :param values: list of 81 values by rows.
+    :return: tuple of the canonical grid as a string and the transform leading to it,
+    which is a tuple (transposed, rows, columns, mapping of digits).
+    """
+    best_grid = None
+    best_transform = None
+    for transposed in (False, True):
+        grid = _transpose(values) if transposed else values
+        row_invariants = _line_invariants(grid)
+        column_invariants = _line_invariants(_transpose(grid))
+        row_orders = _line_orders(row_invariants)
+        column_orders = _line_orders(column_invariants)
+        if len(row_orders) * len(column_orders) > MAX_TRANSFORMS:
+            if len(row_orders) > len(column_orders):
+                row_orders = _line_orders(row_invariants, exhaustive=False)
+            else:
+                column_orders = _line_orders(column_invariants, exhaustive=False)
+            if len(row_orders) * len(column_orders) > MAX_TRANSFORMS:
+                row_orders = _line_orders(row_invariants, exhaustive=False)
+                column_orders = _line_orders(column_invariants, exhaustive=False)
+
+        for rows in row_orders:
+            for columns in column_orders:
+                candidate, mapping = _relabel(grid, rows, columns)
+                if best_grid is None or candidate < best_grid:
+                    best_grid = candidate
+                    best_transform = (transposed, rows, columns, mapping)
+
+    # Digits missing from the puzzle get the remaining labels in ascending order:
+    mapping = best_transform[3]
+    for digit in range(1, 10):
+        if digit not in mapping:
+            mapping[digit] = len(mapping)
+    return ''.join(map(str, best_grid)), best_transform
+
+
+def apply_transform(values, transform):
+    """Map a grid (e.g. a solution) of the original puzzle to the canonical one."""
+    transposed, rows, columns, mapping = transform
+    grid = _transpose(values) if transposed else values
+    return [mapping[grid[row * 9 + column]] for row in rows for column in columns]
+
+
+def invert_transform(values, transform):
+    """Map a grid of the canonical puzzle (e.g. a stored solution) back to the original one."""
+    transposed, rows, columns, mapping = transform
+    digits = {label: digit for digit, label in mapping.items()}
+    grid = [0] * 81
+    for row_id, row in enumerate(rows):
+        for column_id, column in enumerate(columns):
+            grid[row * 9 + column] = digits[values[row_id * 9 + column_id]]
+    return _transpose(grid) if transposed else grid
+
+
+class SolutionCache:
+    """
+    A bounded LRU cache of solutions by canonical puzzles, optionally persisted in an SQLite file.
+    Puzzles missing from the cache are solved by SudokuSolver.
+    """
+
+    def __init__(self, capacity=100000, path=None, commit_every=1000):
+        """
+        :param capacity: maximum number of solutions kept in memory.
+        :param path: optional path of an SQLite file, which keeps solutions between runs.
+        :param commit_every: number of new solutions after which they are committed to the file.
+        """
+        self.capacity = capacity
+        self.solutions = OrderedDict()  # canonical puzzle: canonical solution
+        self.hits = 0
+        self.misses = 0
+        self.commit_every = commit_every
+        self.uncommitted = 0
+        self.connection = None
+        if path:
+            self.connection = sqlite3.connect(path)
+            self.connection.execute('CREATE TABLE IF NOT EXISTS solutions (puzzle TEXT PRIMARY KEY, solution TEXT)')
+
+    def solve(self, puzzle):
+        """
+        Return a solution of a puzzle, using the cache if an equivalent puzzle was solved before.
+        Canonical forms are only defined for 9x9 puzzles, so puzzles of other sizes are always solved.
+
+        :param puzzle: puzzle string, e.g. of 81 characters.
+        :return: solution string, or None if the board is invalid.
+        """
+        board = SudokuBoard.from_string(puzzle)
+        if board.layout is not STANDARD:
+            try:
+                SudokuSolver(board).solve()
+            except InvalidBoard:
+                return None
+            return board.to_string()
+
+        key, transform = canonicalize(board.values)
+        solution = self.lookup(key)
+        if solution is not None:
+            self.hits += 1
+            board.values = invert_transform([int(value) for value in solution], transform)
+            return board.to_string()
+
+        self.misses += 1
+        try:
+            SudokuSolver(board).solve()
+        except InvalidBoard:
+            return None
+        self.store(key, ''.join(map(str, apply_transform(board.values, transform))))
+        return board.to_string()
+
+    def lookup(self, key):
+        """Return a canonical solution of a canonical puzzle from memory or the file, None if missing."""
+        solution = self.solutions.get(key)
+        if solution is not None:
+            self.solutions.move_to_end(key)
+            return solution
+        if self.connection is not None:
+            row = self.connection.execute('SELECT solution FROM solutions WHERE puzzle = ?', (key,)).fetchone()
+            if row:
+                self._remember(key, row[0])
+                return row[0]
+        return None
+
+    def store(self, key, solution):
+        """Add a canonical solution to memory and the file."""
+        self._remember(key, solution)
+        if self.connection is not None:
+            self.connection.execute('INSERT OR REPLACE INTO solutions VALUES (?, ?)', (key, solution))
+            self.uncommitted += 1
+            if self.uncommitted >= self.commit_every:
+                self.commit()
+
+    def _remember(self, key, solution):
+        self.solutions[key] = solution
+        if len(self.solutions) > self.capacity:
+            self.solutions.popitem(last=False)
+
+    def commit(self):
+        """Write solutions added since the last commit to the file."""
+        if self.connection is not None:
+            self.connection.commit()
+            self.uncommitted = 0
+
+    def close(self):
+        """Commit and close the file."""
+        if self.connection is not None:
+            self.commit()
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,138 @@
+"""
+Command-line solver, run without the GUI. Puzzles are read from files or the standard input and solutions are
+written to the standard output, one per line and in the order of puzzles. For example:
+
+    python -m solve puzzles.txt
+    python -m solve --stats < puzzles.txt > solutions.txt
+    python -m solve --processes 8 first.txt second.txt
+
+Only the solver modules are loaded, so it starts fast and runs on machines without a display.
+The GUI (and Tk with it) is imported only when asked for with --gui.
+"""
+import argparse
+import sys
+from time import perf_counter
+
+from board_model import BOX_SIZES, InvalidBoard, SudokuBoard
+from SudokuSolver import SolveStats, SudokuSolver
+
+INVALID = 'invalid'  # written instead of a solution of an invalid or unsolvable puzzle
+GRID_DECORATIONS = str.maketrans('', '', '|+-= \t')  # borders of grids drawn with text, and spaces between cells
+CELL_COUNTS = tuple(box_size ** 4 for box_size in BOX_SIZES if box_size != 2)  # lengths of single-line puzzles
+ROW_SIZES = tuple(box_size ** 2 for box_size in BOX_SIZES)  # lengths of rows of grids
+
+
+def parse_puzzles(lines):
+    """
+    Read puzzles from lines of text in the common formats:
+    - one puzzle per line, e.g. of 81 characters, with '.' or '0' for empty cells,
+    - CSV lines whose first field is a puzzle, e.g. 'puzzle,solution', with an optional header line,
+    - grids of one row per line, optionally drawn with '|', '+' and '-' borders and spaces between cells.
+    Empty lines and lines starting with '#' are skipped. A 16-character line is read as a row of a 16x16 grid,
+    so 4x4 puzzles have to be written as grids. Lines of other lengths are passed on as they are,
+    so they are reported as invalid instead of stopping the stream.
+
+    :param lines: iterable of lines, e.g. an open file.
+    :return: generator of puzzle strings by rows, accepted by SudokuBoard.from_string.
+    """
+    grid = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        line = line.split(',', 1)[0].translate(GRID_DECORATIONS)
+        if not line:  # a border of a grid
+            continue
+        if not grid and not any(char.isdigit() or char == '.' for char in line):  # a header line
+            continue
+        if not grid and len(line) in CELL_COUNTS:
+            yield line
+        elif len(line) in ROW_SIZES and (not grid or len(line) == len(grid[0])):
+            grid.append(line)
+            if len(grid) == len(line):
+                yield ''.join(grid)
+                grid = []
+        else:
+            if grid:
+                yield ''.join(grid)
+                grid = []
+            yield line
+    if grid:
+        yield ''.join(grid)
+
+
+def read_lines(paths):
+    """Return a generator of lines of the given files in turn, '-' standing for the standard input."""
+    for path in paths:
+        if path == '-':
+            yield from sys.stdin
+        else:
+            with open(path) as file:
+                yield from file
+
+
+def solve_puzzles_here(puzzles, stats):
+    """
+    Solve puzzles one by one in this process.
+
+    :param puzzles: iterable of puzzle strings.
+    :param stats: SolveStats instance, to which statistics of every solved puzzle are added.
+    :return: generator of (puzzle, solution) tuples, with None as the solution of an invalid puzzle.
+    """
+    for puzzle in puzzles:
+        try:
+            board = SudokuBoard.from_string(puzzle)
+            solver = SudokuSolver(board)
+            solved = solver.solve()
+        except (ValueError, InvalidBoard):
+            yield puzzle, None
+            continue
+        stats.merge(solver.stats)
+        yield puzzle, board.to_string() if solved else None
+
+
+def print_stats(count, invalid, seconds, stats, file):
+    """Print a summary of a run, with lines starting with '#' so the output stays readable by parse_puzzles."""
+    rate = count / seconds if seconds else 0.0
+    print(f'# {count} puzzles, {count - invalid} solved, {invalid} invalid in {seconds:.3f} s '
+          f'({rate:.1f} puzzles/s)', file=file)
+    for technique, technique_stats in stats.techniques.items():
+        print(f'# {technique}: {technique_stats.invocations} invocations, {technique_stats.placements} placements, '
+              f'{technique_stats.eliminations} eliminations, {technique_stats.seconds * 1000:.1f} ms', file=file)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Solve Sudoku puzzles from files or the standard input.')
+    parser.add_argument('paths', nargs='*', default=['-'], help="puzzle files, '-' for the standard input (default)")
+    parser.add_argument('--processes', type=int, help='solve across a pool of worker processes (no technique stats)')
+    parser.add_argument('--stats', action='store_true', help='print a summary and technique statistics at the end')
+    parser.add_argument('--gui', action='store_true', help='open the GUI instead')
+    args = parser.parse_args(args)
+
+    if args.gui:
+        import main as gui  # Tk is loaded only here
+        gui.main()
+        return
+
+    puzzles = parse_puzzles(read_lines(args.paths))
+    stats = SolveStats()
+    if args.processes:
+        from batch import solve_puzzles
+        results = solve_puzzles(puzzles, args.processes)
+    else:
+        results = solve_puzzles_here(puzzles, stats)
+
+    count = invalid = 0
+    start = perf_counter()
+    for _, solution in results:
+        count += 1
+        if solution is None:
+            invalid += 1
+        sys.stdout.write((solution or INVALID) + '\n')
+    if args.stats:
+        print_stats(count, invalid, perf_counter() - start, stats, sys.stdout)
+    sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+from array import array
+
+from board_model import STANDARD, SYMBOLS, mask_digits
+
+PLACEMENT = 0
+ELIMINATION = 1
+
+# Bit fields of a packed step, wide enough for 25x25 boards: a 25-bit mask, a 10-bit cell index and the kind.
+CELL_SHIFT = 25
+KIND_SHIFT = 35
+TECHNIQUE_SHIFT = 36
+
+
+class StepTrace:
+    """
+    A trace of every step taken by the Solver: placed digits and eliminated possible values, with the name
+    of the technique used. Steps are packed into single integers and kept in a preallocated ring buffer
+    holding the latest `capacity` steps. Optionally every step is also written to a text stream.
+    """
+
+    def __init__(self, capacity=4096, stream=None, layout=STANDARD):
+        """
+        :param capacity: number of latest steps kept in memory.
+        :param stream: optional text file to which every step is written as a line.
+        :param layout: Layout of the traced board, used to name cells. The Solver sets it to its board's Layout.
+        """
+        self.capacity = capacity
+        self.layout = layout
+        self.records = array('Q', [0]) * capacity
+        self.count = 0  # number of steps recorded so far
+        self.stream = stream
+        self.techniques = []  # technique names by their ids used in records
+        self.technique_ids = {}
+
+    def record(self, technique, kind, cell, mask):
+        """
+        Add a step to the trace.
+
+        :param technique: name of the technique which made the step.
+        :param kind: PLACEMENT or ELIMINATION.
+        :param cell: index of the cell.
+        :param mask: placed digit or eliminated values as a candidate mask.
+        """
+        technique_id = self.technique_ids.get(technique)
+        if technique_id is None:
+            technique_id = self.technique_ids[technique] = len(self.techniques)
+            self.techniques.append(technique)
+        self.records[self.count % self.capacity] = (technique_id << TECHNIQUE_SHIFT | kind << KIND_SHIFT
+                                                    | cell << CELL_SHIFT | mask)
+        self.count += 1
+        if self.stream is not None:
+            self.stream.write(format_step(technique, kind, cell, mask_digits(mask), self.layout) + '\n')
+
+    def steps(self):
+        """Return the steps kept in memory, oldest first, as (technique, kind, cell, digits) tuples."""
+        first = max(0, self.count - self.capacity)
+        steps = []
+        for step in range(first, self.count):
+            record = self.records[step % self.capacity]
+            steps.append((self.techniques[record >> TECHNIQUE_SHIFT], record >> KIND_SHIFT & 1,
+                          record >> CELL_SHIFT & 0x3ff, mask_digits(record & (1 << CELL_SHIFT) - 1)))
+        return steps
+
+    def __str__(self):
+        return '\n'.join(format_step(*step, self.layout) for step in self.steps())
+
+
+def format_step(technique, kind, cell, digits, layout=STANDARD):
+    """
+    Return a readable description of a step, e.g. 'check_singles: r1c3 = 5'. Digits above 9 are written
+    as letters (see SYMBOLS).
+    """
+    if kind == PLACEMENT:
+        return f'{technique}: {layout.cell_name(cell)} = {SYMBOLS[digits[0] - 1]}'
+    return f"{technique}: {layout.cell_name(cell)} <> {','.join(SYMBOLS[digit - 1] for digit in digits)}"
@@ -87,3 +87,57 @@ VERY_HARD_BOARD_3 = [[3, None, None, None, None, None, None, 9, 7],
                      [None, 5, 8, None, None, None, None, None, 2],
                      [None, 1, None, 6, None, None, None, None, None],
                      [None, None, None, None, 7, None, None, 4, None]]
+
+
+SMALL_BOARD = [[None, 2, None, 1],
+               [None, None, None, None],
+               [2, 1, None, 3],
+               [None, None, None, None]]
+
+BOARD_16X16 = [[14, 6, 4, 12, None, None, None, 1, 10, None, None, 13, None, None, 11, None],
+               [None, None, 10, None, None, None, 5, 2, None, None, None, 1, None, None, None, None],
+               [None, None, None, None, None, None, None, None, None, 3, None, None, 13, 16, 8, None],
+               [None, None, None, 3, 8, None, None, None, None, 12, 14, 6, None, None, 15, 9],
+               [None, 3, 14, None, 13, None, None, None, None, None, None, None, None, None, 1, None],
+               [None, None, None, None, None, None, None, None, 15, None, None, 16, None, 5, 2, 14],
+               [None, None, 11, None, 6, 4, None, 12, None, 5, 2, None, None, 10, None, None],
+               [13, None, None, None, None, 5, None, None, 11, None, 1, 7, 12, 4, None, 8],
+               [5, 14, 12, None, None, 1, None, None, None, None, 4, None, 11, None, None, None],
+               [None, 8, None, 13, 9, None, 3, 11, None, None, None, None, None, 6, None, 12],
+               [None, None, None, None, None, 6, None, None, 3, 2, 9, None, 8, None, None, None],
+               [None, None, None, 2, 4, None, 16, None, None, None, None, 14, None, None, 10, None],
+               [None, 5, None, None, 16, 15, 1, 10, None, 8, None, None, 9, None, None, None],
+               [None, None, None, None, None, None, None, 5, 2, None, 7, None, None, None, None, None],
+               [None, 4, None, None, None, 11, 2, None, None, None, None, 10, None, None, 3, 6],
+               [7, None, None, None, None, 8, None, None, None, 14, None, None, 10, 15, 16, 1]]
+
+# 25x25 board by rows, read with SudokuBoard.from_string. Digits above 9 are written as letters A-P:
+BOARD_25X25 = ('.P..1J.N58..B....6EO7M.92'
+               '...A..O.6..97.M.K.3..1.LP'
+               'H27.MG.P14E.....N.JA.F3..'
+               '...I..92..JA8.....G..6..D'
+               '.DC..3...BGL4.1.2...8....'
+               '...8EK.I...71...9..B....A'
+               'PL.........CFI3.....MH2B9'
+               '.A5...8O..2B.9H..3KC....L'
+               'K...3...H.N...J1.G.7.....'
+               '2..B.P.LG1D.6..5...4...C.'
+               'O.E..I.CK3.M..P.B.....A1.'
+               'I..6K9FB....J4N.7PL..DO..'
+               'L7G..A.4.....CKE8DO5.....'
+               '...F2.........DJ.NA13..6.'
+               '.4J.N....E9F...3C......M.'
+               '....97.M..8..5...A4GK...6'
+               'C6..I.3..2....AP...H...J5'
+               '.5....E.I.7HP.L...B3N...1'
+               '4.NG..J..DB32F.K...EPL...'
+               '..P.....A....6...O...9..F'
+               '6EI...K.B..P..4LH.M2..5NJ'
+               '.J.N8.D.CI...H.9.....4...'
+               '.39K......5N.J8..41P....E'
+               '1.......8O......E.6.L7..H'
+               '.H.271.G..6...COJ.5.9...3')
+
+# A 9x9 board with many solutions, on which a search without restarts can spend a very long time below
+# an early wrong guess, read with SudokuBoard.from_string:
+MANY_SOLUTIONS_BOARD = '.....6....59.....82....8....45........3........6..3.54...325..6..................'
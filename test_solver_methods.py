@@ -1,9 +1,415 @@
+import io
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
 import unittest
+from contextlib import redirect_stdout
+
+from batch import solve_corpus, solve_puzzles
+from benchmark import DIFFICULTIES, build_corpus
+from corpus import RECORD_SIZE, Corpus, write_corpus
+from generator import GRADES, generate_puzzles, grade
+from step_trace import PLACEMENT, StepTrace
+from board_model import CELL_UNITS, PEERS, UNITS, InvalidBoard, SudokuBoard, digit_mask
+from SudokuSolver import SolveCancelled, SudokuSolver
+from solution_cache import SolutionCache, canonicalize
+from solve import INVALID, main, parse_puzzles
+from search import luby
+from sudoku_boards import *
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def blanked_board_16x16():
+    """Return the solved 16x16 sample board with 60% of its cells emptied, which the search has to finish."""
+    solution = SudokuBoard.from_rows(BOARD_16X16)
+    SudokuSolver(solution).solve()
+    values = solution.values.copy()
+    for cell in random.Random(0).sample(range(256), 154):
+        values[cell] = 0
+    return SudokuBoard(values, box_size=4)
+
+
+def shuffle_board(values, rng):
+    """
+    Return a puzzle equivalent to the given one: digits are relabelled, rows and columns are permuted within bands
+    and stacks, bands and stacks are permuted and the board may be transposed.
+    """
+    def permutation():
+        groups = rng.sample(range(3), 3)
+        return [group * 3 + line for group in groups for line in rng.sample(range(3), 3)]
+
+    digits = [0] + rng.sample(range(1, 10), 9)
+    rows = permutation()
+    columns = permutation()
+    transpose = rng.random() < 0.5
+    return [digits[values[column * 9 + row] if transpose else values[row * 9 + column]]
+            for row in rows for column in columns]
+
 
 class TestSolverMethods(unittest.TestCase):
     def test_check_singles(self):
-        pass
+        board = SudokuBoard.from_rows(HARD_BOARD)
+        solver = SudokuSolver(board)
+        board.candidates[0] = digit_mask(9)
+        solver.check_singles()
+        self.assertEqual(board.values[0], 9)
+
+    def test_solves_headless_board(self):
+        placed = []
+        board = SudokuBoard.from_rows(HARD_BOARD)
+        solver = SudokuSolver(board, on_place=lambda index, digit, technique: placed.append(index))
+        self.assertTrue(solver.solve())
+        self.assertEqual(len(placed), sum(row.count(None) for row in HARD_BOARD))
+        self.assertNotIn(None, board.to_rows()[0])
+        self.assertRaises(ValueError, SudokuBoard, [])
+        self.assertEqual(SudokuBoard().values, [0] * 81)
+
+    def test_solve_stats_and_hooks(self):
+        calls = []
+        board = SudokuBoard.from_rows(HARD_BOARD)
+        solver = SudokuSolver(board, hooks=[lambda technique, *counts: calls.append(technique)])
+        solver.solve()
+        stats = solver.stats.techniques
+        self.assertEqual(len(calls), sum(technique.invocations for technique in stats.values()))
+        self.assertEqual(sum(technique.placements for technique in stats.values()),
+                         sum(row.count(None) for row in HARD_BOARD))
+        self.assertGreater(stats['check_singles'].eliminations, 0)
+
+        board = blanked_board_16x16()
+        empty_cells = board.values.count(0)
+        solver = SudokuSolver(board, hooks=[lambda technique, *counts: calls.append(technique)])
+        calls.clear()
+        self.assertTrue(solver.solve())
+        stats = solver.stats.techniques
+        self.assertEqual(len(calls), sum(technique.invocations for technique in stats.values()))
+        self.assertEqual(sum(technique.placements for technique in stats.values()), empty_cells)
+        self.assertEqual(stats['search_remaining_cells'].eliminations, 0)
+        for technique in stats.values():
+            self.assertGreaterEqual(technique.placements, 0)
+            self.assertGreaterEqual(technique.eliminations, 0)
+
+    def test_step_trace_ring_buffer(self):
+        stream = io.StringIO()
+        trace = StepTrace(capacity=16, stream=stream)
+        board = SudokuBoard.from_rows(HARD_BOARD)
+        SudokuSolver(board, trace=trace).solve()
+        steps = trace.steps()
+        self.assertEqual(len(steps), 16)
+        self.assertGreater(trace.count, 16)
+        technique, kind, cell, digits = steps[-1]
+        self.assertEqual(kind, PLACEMENT)
+        self.assertEqual(digits, [board.values[cell]])
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), trace.count)
+        self.assertTrue(lines[0].startswith('initial_analysis: r1c1 <> '))
+
+        trace = StepTrace()
+        board = SudokuBoard.from_rows(BOARD_16X16)
+        SudokuSolver(board, trace=trace).solve()
+        technique, kind, cell, digits = trace.steps()[-1]
+        row, column = divmod(cell, 16)
+        self.assertEqual(str(trace).splitlines()[-1],
+                         f'{technique}: r{row + 1}c{column + 1} = {board.to_string()[cell]}')
+        self.assertIn('G', str(trace))  # digit 16
+
+    def test_position_index_follows_updates(self):
+        board = SudokuBoard.from_rows(EXPERT_BOARD)
+        solver = SudokuSolver(board)
+        solver.solve(fallback=False)
+        positions = [unit_positions.copy() for unit_positions in solver.positions]
+        bivalue_cells = {values: cells for values, cells in solver.bivalue_cells.items() if cells}
+        solver.index_positions()
+        self.assertEqual(positions, solver.positions)
+        self.assertEqual(bivalue_cells, solver.bivalue_cells)
+
+    def test_subset_eliminations(self):
+        board = SudokuBoard.from_rows(EMPTY_BOARD)
+        # Naked triple in row 1: (1, 2), (2, 3) and (1, 2, 3):
+        for cell, digits in ((0, (1, 2)), (1, (2, 3)), (2, (1, 2, 3))):
+            board.candidates[cell] = sum(digit_mask(digit) for digit in digits)
+        # Hidden pair in row 9: digits 4 and 5 can only be in r9c1 and r9c2:
+        for cell in range(74, 81):
+            board.candidates[cell] &= ~(digit_mask(4) | digit_mask(5))
+        solver = SudokuSolver(board)
+        solver.check_naked_pairs()
+        self.assertEqual(board.possible_values(3), list(range(1, 10)))
+        solver.check_naked_triples()
+        self.assertEqual(board.possible_values(3), list(range(4, 10)))
+        solver.check_hidden_pairs()
+        self.assertEqual(board.possible_values(72), [4, 5])
+        self.assertEqual(board.possible_values(73), [4, 5])
+
+    def test_pointing_and_claiming(self):
+        board = SudokuBoard.from_rows(EMPTY_BOARD)
+        # Within square 1, digit 1 can only be in row 1 (three cells):
+        for cell in (9, 10, 11, 18, 19, 20):
+            board.candidates[cell] &= ~digit_mask(1)
+        # Within row 5, digit 2 can only be in square 5:
+        for column in (0, 1, 2, 6, 7, 8):
+            board.candidates[36 + column] &= ~digit_mask(2)
+        solver = SudokuSolver(board)
+        solver.check_pointing()
+        self.assertFalse(any(board.candidates[cell] & digit_mask(1) for cell in range(3, 9)))
+        self.assertTrue(board.candidates[30] & digit_mask(2))
+        solver.check_claiming()
+        self.assertFalse(any(board.candidates[cell] & digit_mask(2) for cell in (30, 31, 32, 48, 49, 50)))
+        self.assertTrue(board.candidates[39] & digit_mask(2))
+
+    def test_fish_eliminations(self):
+        board = SudokuBoard.from_rows(EMPTY_BOARD)
+        # Digit 1 can only be in columns 1, 5 and 9 of rows 1, 5 and 9, pairwise, which is a Swordfish:
+        for row, columns in ((0, (0, 4)), (4, (4, 8)), (8, (0, 8))):
+            for column in range(9):
+                if column not in columns:
+                    board.candidates[row * 9 + column] ^= digit_mask(1)
+        solver = SudokuSolver(board)
+        solver.check_x_wing()
+        self.assertTrue(board.candidates[18] & digit_mask(1))
+        solver.check_swordfish()
+        self.assertFalse(any(board.candidates[row * 9 + column] & digit_mask(1)
+                             for row in range(9) if row not in (0, 4, 8) for column in (0, 4, 8)))
+        self.assertTrue(board.candidates[19] & digit_mask(1))
+
+    def test_y_wing_eliminations(self):
+        board = SudokuBoard.from_rows(EMPTY_BOARD)
+        # Pivot r1c1 (1, 2) sees pincers r1c5 (1, 3) and r5c1 (2, 3), so r5c5 cannot be 3:
+        for cell, digits in ((0, (1, 2)), (4, (1, 3)), (36, (2, 3))):
+            board.candidates[cell] = digit_mask(digits[0]) | digit_mask(digits[1])
+        solver = SudokuSolver(board)
+        self.assertEqual(solver.bivalue_cells[digit_mask(1) | digit_mask(3)], {4})
+        solver.check_y_wing()
+        self.assertEqual(board.possible_values(40), [1, 2, 4, 5, 6, 7, 8, 9])
+        self.assertEqual(board.possible_values(41), list(range(1, 10)))
+
+    def test_worklists_follow_changes(self):
+        board = SudokuBoard.from_rows(HARD_BOARD)
+        solver = SudokuSolver(board)
+        self.assertEqual(solver.take_worklist('test'), (2 ** 27 - 1, 0b111111111))
+        self.assertEqual(solver.take_worklist('test'), (0, 0))
+        cell = board.values.index(0)
+        value = board.candidates[cell] & -board.candidates[cell]
+        solver.update_cells(influenced_cells=[cell], values=value)
+        self.assertEqual(solver.take_worklist('test'), (sum(1 << unit for unit in CELL_UNITS[cell]), value))
+        self.assertEqual(solver.take_worklist('test'), (0, 0))
+
+    def test_snapshot_and_rollback(self):
+        for rows in (EXPERT_BOARD, Y_WING_TEST_BOARD):
+            board = SudokuBoard.from_rows(rows)
+            solver = SudokuSolver(board)
+            snapshot = solver.snapshot()
+            positions = [unit_positions.copy() for unit_positions in solver.positions]
+            mark = solver.mark()
+            try:
+                solver.solve(fallback=False)
+            except InvalidBoard:
+                pass
+            self.assertNotEqual(solver.snapshot(), snapshot)
+            solver.rollback(mark)
+            self.assertEqual(solver.snapshot(), snapshot)
+            self.assertEqual(solver.positions, positions)
+
+        solver = SudokuSolver(SudokuBoard.from_rows(HARD_BOARD))
+        snapshot = solver.snapshot()
+        self.assertTrue(solver.solve())
+        solution = solver.board.values.copy()
+        solver.restore(snapshot)
+        self.assertEqual(solver.snapshot(), snapshot)
+        self.assertTrue(solver.solve())
+        self.assertEqual(solver.board.values, solution)
+
+    def test_search_fallback_solves_very_hard_boards(self):
+        for rows in (VERY_HARD_BOARD, VERY_HARD_BOARD_2, VERY_HARD_BOARD_3):
+            board = SudokuBoard.from_rows(rows)
+            self.assertTrue(SudokuSolver(board).solve())
+            for unit in UNITS:
+                self.assertEqual({board.values[cell] for cell in unit}, set(range(1, 10)))
+
+        # Without restarts, the search takes tens of seconds on this board:
+        board = SudokuBoard.from_string(MANY_SOLUTIONS_BOARD)
+        start = time.perf_counter()
+        self.assertTrue(SudokuSolver(board).solve())
+        self.assertLess(time.perf_counter() - start, 2)
+        for unit in UNITS:
+            self.assertEqual({board.values[cell] for cell in unit}, set(range(1, 10)))
+        self.assertEqual([luby(index) for index in range(1, 16)], [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8])
+
+    def test_solve_puzzles_in_pool(self):
+        puzzles = [SudokuBoard.from_rows(rows).to_string() for rows in (HARD_BOARD, VERY_HARD_BOARD, Y_WING_TEST_BOARD)]
+        results = list(solve_puzzles(puzzles, processes=2, chunksize=1))
+        self.assertEqual([puzzle for puzzle, _ in results], puzzles)
+        self.assertNotIn('.', results[1][1])
+        self.assertTrue(results[1][1].startswith('182'))
+        self.assertIsNone(results[2][1])
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_vectorized_solve_batch(self):
+        from vectorized import solve_batch
+
+        puzzles = [SudokuBoard.from_rows(rows).to_string() for rows in (HARD_BOARD, EXPERT_BOARD, Y_WING_TEST_BOARD)]
+        self.assertEqual(solve_batch(puzzles), [solution for _, solution in solve_puzzles(puzzles, processes=1)])
+
+    def test_benchmark_corpus_is_graded_and_reproducible(self):
+        self.assertEqual(sorted(grade for grades in DIFFICULTIES.values() for grade in grades), sorted(GRADES))
+        corpus = build_corpus(2, seed=1, processes=1)
+        self.assertEqual(corpus, build_corpus(2, seed=1, processes=1))
+        for difficulty, puzzles in corpus.items():
+            self.assertEqual(len(puzzles), 2)
+            self.assertEqual(len(set(map(tuple, puzzles))), 2)
+            for puzzle in puzzles:
+                self.assertIn(grade(puzzle), DIFFICULTIES[difficulty])
+                self.assertTrue(SudokuSolver(SudokuBoard(puzzle)).solve())
+
+    def test_count_solutions_up_to_limit(self):
+        self.assertTrue(SudokuSolver(SudokuBoard.from_rows(VERY_HARD_BOARD_3)).is_unique())
+        self.assertEqual(SudokuSolver(SudokuBoard.from_rows(EMPTY_BOARD)).count_solutions(3), 3)
+        self.assertEqual(SudokuSolver(SudokuBoard.from_rows(Y_WING_TEST_BOARD)).count_solutions(), 0)
+
+        calls = []
+        solver = SudokuSolver(SudokuBoard.from_string(MANY_SOLUTIONS_BOARD),
+                              hooks=[lambda technique, *counts: calls.append(technique)])
+        start = time.perf_counter()
+        self.assertFalse(solver.is_unique())
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertEqual((calls, solver.stats.techniques), ([], {}))
+
+        board = SudokuBoard.from_rows(HARD_BOARD)
+        solver = SudokuSolver(board)
+        self.assertTrue(solver.is_unique())
+        self.assertEqual(board.values, SudokuBoard.from_rows(HARD_BOARD).values)
+        self.assertTrue(solver.solve())
+        self.assertEqual(sum(technique.placements for technique in solver.stats.techniques.values()),
+                         sum(row.count(None) for row in HARD_BOARD))
+
+    def test_contradictions_are_reported_where_they_occur(self):
+        board = SudokuBoard.from_rows(EMPTY_BOARD)
+        board.place(0, 5)
+        board.place(10, 5)
+        with self.assertRaises(InvalidBoard) as context:
+            SudokuSolver(board)
+        self.assertEqual((context.exception.cell, context.exception.unit), (10, 18))
+
+        solver = SudokuSolver(SudokuBoard.from_rows(Y_WING_TEST_BOARD))
+        with self.assertRaises(InvalidBoard) as context:
+            solver.solve()
+        self.assertIsNotNone(context.exception.cell)
+
+    def test_generated_puzzles_are_unique_and_graded(self):
+        for puzzle, puzzle_grade in generate_puzzles(2, processes=1, seed=7):
+            board = SudokuBoard.from_string(puzzle)
+            self.assertTrue(SudokuSolver(board).is_unique())
+            self.assertEqual(board.to_string(), puzzle)
+            self.assertEqual(grade(board.values), puzzle_grade)
+        self.assertEqual(grade(SudokuBoard.from_rows(HARD_BOARD).values), 'hidden_singles')
+        with self.assertRaises(ValueError):
+            next(generate_puzzles(1, difficulty='xwing', processes=1))
+        self.assertEqual(list(generate_puzzles(1, difficulty='jellyfish', processes=1, max_seeds=3)), [])
+
+    def test_cancelled_solver_stops(self):
+        board = SudokuBoard.from_rows(VERY_HARD_BOARD)
+        solver = SudokuSolver(board)
+        solver.cancel()
+        self.assertRaises(SolveCancelled, solver.solve)
+        self.assertRaises(SolveCancelled, solver.search_remaining_cells)
+
+    def test_solution_cache_shares_equivalent_puzzles(self):
+        values = SudokuBoard.from_rows(EXPERT_BOARD).values
+        shuffled = shuffle_board(values, random.Random(5))
+        self.assertEqual(canonicalize(values)[0], canonicalize(shuffled)[0])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'solutions.sqlite')
+            with SolutionCache(path=path) as cache:
+                cache.solve(SudokuBoard(values).to_string())
+            with SolutionCache(path=path) as cache:
+                solution = cache.solve(SudokuBoard(shuffled).to_string())
+                self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+        board = SudokuBoard(shuffled)
+        SudokuSolver(board).solve()
+        self.assertEqual(solution, board.to_string())
+
+    def test_lookup_tables(self):
+        self.assertEqual(len(UNITS), 27)
+        self.assertTrue(all(len(peers) == 20 for peers in PEERS))
+        self.assertEqual([UNITS[unit] for unit in CELL_UNITS[10]][2], (0, 1, 2, 9, 10, 11, 18, 19, 20))
+        self.assertNotIn(10, PEERS[10])
+
+    def test_solves_other_board_sizes(self):
+        for board in (SudokuBoard.from_rows(SMALL_BOARD), SudokuBoard.from_rows(BOARD_16X16),
+                      SudokuBoard.from_string(BOARD_25X25)):
+            layout = board.layout
+            self.assertEqual(len(layout.peers[0]), 3 * layout.size - 2 * layout.box_size - 1)
+            self.assertTrue(SudokuSolver(board).solve(fallback=False))
+            for unit in layout.units:
+                self.assertEqual(sorted(board.values[cell] for cell in unit), list(range(1, layout.size + 1)))
+            self.assertEqual(SudokuBoard.from_string(board.to_string()).values, board.values)
+
+    def test_search_restarts_on_large_boards(self):
+        board = blanked_board_16x16()
+        values = board.values.copy()
+        solver = SudokuSolver(board)
+        self.assertFalse(solver.solve(fallback=False))
+        self.assertTrue(solver.solve())
+        self.assertIn('search_remaining_cells', solver.stats.techniques)
+        for cell, value in enumerate(values):
+            if value:
+                self.assertEqual(board.values[cell], value)
+        for unit in board.layout.units:
+            self.assertEqual(sorted(board.values[cell] for cell in unit), list(range(1, 17)))
+
+    def test_command_line_reads_common_formats(self):
+        puzzle = SudokuBoard.from_rows(HARD_BOARD).to_string()
+        rows = [' '.join(puzzle[row * 9:row * 9 + 9]) for row in range(9)]
+        lines = ['quizzes,solutions', puzzle.replace('.', '0') + ',', '# comment', '', *rows[:3], '------+------',
+                 *rows[3:], '123']
+        self.assertEqual(list(parse_puzzles(line + '\n' for line in lines)), [puzzle.replace('.', '0'), puzzle, '123'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'puzzles.txt')
+            with open(path, 'w') as file:
+                file.write('\n'.join(lines))
+            output = io.StringIO()
+            with redirect_stdout(output):
+                main([path, '--stats'])
+        solutions = output.getvalue().splitlines()
+        solution = solutions[0]
+        self.assertEqual(solutions[1:3], [solution, INVALID])
+        self.assertTrue(solutions[3].startswith('# 3 puzzles, 2 solved, 1 invalid'))
+
+        code = 'import sys, batch, solve; print("tkinter" in sys.modules or "numpy" in sys.modules)'
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(result.stdout.strip(), 'False')
+
+    def test_binary_corpus(self):
+        puzzles = [SudokuBoard.from_rows(rows).to_string() for rows in (HARD_BOARD, EXPERT_BOARD, Y_WING_TEST_BOARD)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'puzzles.sdc')
+            self.assertEqual(write_corpus(path, puzzles[:2] + [SudokuBoard.from_string(puzzles[2]).values]), 3)
+            self.assertEqual(os.path.getsize(path), 16 + 3 * RECORD_SIZE)
+            with Corpus(path) as corpus:
+                self.assertEqual(list(corpus), puzzles)
+                self.assertEqual(corpus[-1], puzzles[2])
+                self.assertEqual(corpus.values(1), SudokuBoard.from_string(puzzles[1]).values)
+                record = corpus.record(0)  # views may outlive the corpus
+                if numpy is not None:
+                    from vectorized import solve_batch, solve_values
+
+                    records = corpus.records(1, 3)
+                    self.assertEqual(records.shape, (2, RECORD_SIZE))
+                    self.assertEqual(records[0].tobytes(), bytes(corpus.record(1)))
+                    self.assertEqual(solve_values(corpus.values_array()), solve_batch(puzzles))
+            self.assertEqual(len(bytes(record)), RECORD_SIZE)
+            self.assertEqual(list(solve_corpus(path, processes=2, chunksize=1)),
+                             list(solve_puzzles(puzzles, processes=1)))
 
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Vectorized candidate propagation over many boards at once. Requires NumPy.
+
+N boards are kept as an (N, 81) array of values (0 for an empty cell) and an (N, 81, 9) boolean
+candidate tensor. Peer elimination, singles and hidden singles are applied to all boards with
+reductions over the unit lookup tables, and boards that need more work are handed to SudokuSolver.
+"""
+import numpy as np
+
+from board_model import CELL_UNITS, UNITS, InvalidBoard, SudokuBoard
+from SudokuSolver import SudokuSolver
+
+UNIT_CELLS = np.array(UNITS, dtype=np.intp)  # (27, 9)
+CELL_UNIT_IDS = np.array(CELL_UNITS, dtype=np.intp)  # (81, 3)
+DIGITS = np.arange(1, 10, dtype=np.int8)
+DIGIT_BITS = 1 << np.arange(9)
+
+
+def parse_puzzles(puzzles):
+    """
+    Convert 81-character puzzle strings into an (N, 81) array of values.
+    Empty cells are marked with '0' or '.'.
+    """
+    puzzles = [puzzle.strip() for puzzle in puzzles]
+    if any(len(puzzle) != 81 for puzzle in puzzles):
+        raise ValueError('Every puzzle has to have 81 cells')
+    chars = np.frombuffer(''.join(puzzles).encode('ascii'), dtype=np.uint8).reshape(-1, 81)
+    values = chars.astype(np.int8) - ord('0')
+    values[chars == ord('.')] = 0
+    if values.size and (values.min() < 0 or values.max() > 9):
+        raise ValueError('Puzzles can only contain digits and dots')
+    return values
+
+
+def _propagate_step(values):
+    """
+    Apply one round of peer elimination, singles and hidden singles to a batch of boards.
+
+    :param values: (N, 81) array of values, updated in place.
+    :return: tuple of the (N, 81, 9) candidate tensor, a boolean array of boards that changed,
+    and a boolean array of boards found invalid.
+    """
+    placed = values[:, :, None] == DIGITS  # (N, 81, 9)
+    unit_placed = placed[:, UNIT_CELLS, :]  # (N, 27, 9, 9)
+    duplicates = (unit_placed.sum(axis=2) > 1).any(axis=(1, 2))
+
+    # Peer elimination: a digit is impossible if it is already placed in any unit of the cell.
+    digit_in_unit = unit_placed.any(axis=2)  # (N, 27, 9)
+    empty = values == 0
+    candidates = ~digit_in_unit[:, CELL_UNIT_IDS, :].any(axis=2) & empty[:, :, None]
+    counts = candidates.sum(axis=2)
+    no_candidates = (empty & (counts == 0)).any(axis=1)
+
+    # Singles:
+    singles = empty & (counts == 1)
+    single_digits = candidates.argmax(axis=2) + 1
+    values[singles] = single_digits[singles]
+
+    # Hidden singles, for digits with exactly one possible cell in a unit:
+    positions = candidates[:, UNIT_CELLS, :]  # (N, 27, 9, 9)
+    hidden = positions.sum(axis=2) == 1
+    boards, units, digits = np.nonzero(hidden)
+    cells = UNIT_CELLS[units, positions[boards, units, :, digits].argmax(axis=1)]
+    values[boards, cells] = digits + 1
+
+    changed = singles.any(axis=1)
+    changed[boards] = True
+    return candidates, changed, duplicates | no_candidates
+
+
+def propagate(values):
+    """
+    Repeat peer elimination, singles and hidden singles on every board until it stops changing.
+
+    :param values: (N, 81) array of values, updated in place.
+    :return: tuple of the (N, 81, 9) candidate tensor and a boolean array of boards found invalid.
+    """
+    candidates = np.zeros(values.shape + (9,), dtype=bool)
+    invalid = np.zeros(len(values), dtype=bool)
+    active = np.arange(len(values))
+    while active.size:
+        active_values = values[active]
+        active_candidates, changed, active_invalid = _propagate_step(active_values)
+        values[active] = active_values
+        candidates[active] = active_candidates
+        invalid[active] = active_invalid
+        active = active[changed & ~active_invalid]
+    return candidates, invalid
+
+
+def solve_batch(puzzles):
+    """
+    Solve many puzzles at once. Propagation runs vectorized over all boards, and only boards which
+    are left unsolved are finished by SudokuSolver, starting from their candidates.
+
+    :param puzzles: iterable of 81-character puzzle strings.
+    :return: list of solution strings, None for invalid boards.
+    """
+    return solve_values(parse_puzzles(puzzles))
+
+
+def solve_values(values):
+    """
+    Solve many puzzles given as values, e.g. read from a binary corpus (see corpus.Corpus.values_array).
+
+    :param values: (N, 81) array of values, 0 for an empty cell. It is filled in place.
+    :return: list of solution strings, None for invalid boards.
+    """
+    candidates, invalid = propagate(values)
+    masks = (candidates * DIGIT_BITS).sum(axis=2)
+    unsolved = (values == 0).any(axis=1)
+
+    solutions = []
+    for board_id in range(len(values)):
+        if invalid[board_id]:
+            solutions.append(None)
+            continue
+        board = SudokuBoard(values[board_id].tolist())
+        if unsolved[board_id]:
+            for cell in np.flatnonzero(values[board_id] == 0).tolist():
+                board.candidates[cell] = int(masks[board_id, cell])
+            try:
+                SudokuSolver(board).solve()
+            except InvalidBoard:
+                solutions.append(None)
+                continue
+        solutions.append(board.to_string())
+    return solutions